@@ -0,0 +1,156 @@
+"""
+Generates synthetic pyproject.toml files for benchmarks.
+
+    python -m benchmarks.generate --dependencies 5000 --groups 10 > pyproject.toml
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+
+from typing import List, NamedTuple
+
+
+FORMS = ("table", "array", "both")
+
+
+class GeneratorParams(NamedTuple):
+    dependencies: int = 1000
+    groups: int = 5
+    inline_tables: float = 0.2
+    optionals: float = 0.1
+    comments: float = 0.2
+    blank_lines: float = 0.05
+    form: str = "both"
+    seed: int = 0
+
+
+def _generate_table(
+    rnd: random.Random, params: GeneratorParams, names: List[str], main: bool
+) -> List[str]:
+    lines = ['python = "^3.8"'] if main else []
+    for name in names:
+        if rnd.random() < params.blank_lines:
+            lines.append("")
+        if rnd.random() < params.comments:
+            lines.append(f"# a comment about {name}")
+
+        version = f"^{rnd.randint(0, 30)}.{rnd.randint(0, 30)}"
+        is_optional = main and rnd.random() < params.optionals
+        if is_optional or rnd.random() < params.inline_tables:
+            optional = ", optional = true" if is_optional else ""
+            lines.append(f'{name} = {{ version = "{version}"{optional} }}')
+        else:
+            lines.append(f'{name} = "{version}"')
+    return lines
+
+
+def _generate_array(
+    rnd: random.Random, params: GeneratorParams, names: List[str]
+) -> List[str]:
+    lines = []
+    for name in names:
+        if rnd.random() < params.blank_lines:
+            lines.append("")
+        if rnd.random() < params.comments:
+            lines.append(f"    # a comment about {name}")
+        lines.append(
+            f'    "{name} (>={rnd.randint(0, 30)}.0,<{rnd.randint(31, 60)}.0)",'
+        )
+    return lines
+
+
+def generate_pyproject(params: GeneratorParams) -> str:
+    """
+    Returns a pyproject.toml content with `params.dependencies` packages
+    in a random order spread over the main section and `params.groups` groups.
+    """
+    if params.form not in FORMS:
+        raise ValueError(f"form must be one of {FORMS}")
+
+    rnd = random.Random(params.seed)
+    names = [f"package-{i}" for i in range(params.dependencies)]
+    rnd.shuffle(names)
+
+    sections_count = params.groups + 1
+    sections = [names[i::sections_count] for i in range(sections_count)]
+
+    lines = []
+    if params.form in ("array", "both"):
+        lines += ["[project]", 'name = "benchmark"', "dependencies = ["]
+        lines += _generate_array(rnd, params, sections[0])
+        lines += ["]", ""]
+
+    lines += [
+        "[tool.poetry]",
+        'name = "benchmark"',
+        'version = "0.1.0"',
+        'description = ""',
+        'authors = ["<author@example.com>"]',
+        "",
+    ]
+    if params.form in ("table", "both"):
+        lines += ["[tool.poetry.dependencies]"]
+        lines += _generate_table(rnd, params, sections[0], main=True)
+        lines += [""]
+
+    for group, group_names in enumerate(sections[1:]):
+        lines += [f"[tool.poetry.group.group-{group}.dependencies]"]
+        lines += _generate_table(rnd, params, group_names, main=False)
+        lines += [""]
+
+    lines += [
+        "[build-system]",
+        'requires = ["poetry-core"]',
+        'build-backend = "poetry.core.masonry.api"',
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def add_generator_arguments(parser: argparse.ArgumentParser) -> None:
+    defaults = GeneratorParams()
+    parser.add_argument("--dependencies", type=int, default=defaults.dependencies)
+    parser.add_argument("--groups", type=int, default=defaults.groups)
+    parser.add_argument(
+        "--inline-tables",
+        type=float,
+        default=defaults.inline_tables,
+        help="A share of packages specified as inline tables.",
+    )
+    parser.add_argument(
+        "--optionals",
+        type=float,
+        default=defaults.optionals,
+        help="A share of optional packages in the main section.",
+    )
+    parser.add_argument(
+        "--comments",
+        type=float,
+        default=defaults.comments,
+        help="A share of packages with a comment line above them.",
+    )
+    parser.add_argument(
+        "--blank-lines",
+        type=float,
+        default=defaults.blank_lines,
+        help="A share of packages with a blank line above them.",
+    )
+    parser.add_argument("--form", choices=FORMS, default=defaults.form)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+
+
+def params_from_arguments(args: argparse.Namespace) -> GeneratorParams:
+    return GeneratorParams(
+        **{field: getattr(args, field) for field in GeneratorParams._fields}
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_generator_arguments(parser)
+    print(generate_pyproject(params_from_arguments(parser.parse_args())), end="")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""
+Measures the time and peak memory of every sorting stage on generated
+pyproject.toml files, and the phases of `Sorter` the same way as real runs,
+where files over 32 KiB are read by the section-scoped parser.
+
+    python -m benchmarks.run --dependencies 5000 --output results.json
+    python -m benchmarks.run --output results.json --baseline baseline.json
+
+With `--baseline`, the command exits with a non-zero status code if any stage
+got slower than the baseline by more than `--max-slowdown`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from cleo.io.null_io import NullIO
+
+from benchmarks.generate import (
+    GeneratorParams,
+    add_generator_arguments,
+    generate_pyproject,
+    params_from_arguments,
+)
+from poetry_plugin_sort.config import PluginConfig
+from poetry_plugin_sort.profiling import Profiler
+from poetry_plugin_sort.scan import ScanError, ScopedDocument
+from poetry_plugin_sort.sections import SectionPatterns
+from poetry_plugin_sort.sort import SortElement, Sorter, create_section_sorter
+from poetry_plugin_sort.utils import PyProjectFile, write_file_atomically
+
+
+STAGES = (
+    "parse",
+    "parse-scoped",
+    "config",
+    "check",
+    "sort",
+    "apply",
+    "serialize",
+    "save",
+)
+# phases of `Sorter` in the check and sort modes
+SORTER_PHASES = ("load", "config", "sections", "save", "total")
+SORTER_STAGES = tuple(
+    f"{mode}:{phase}"
+    for mode in ("sorter-check", "sorter")
+    for phase in SORTER_PHASES
+    if not (mode == "sorter-check" and phase == "save")
+)
+
+
+class _Stopwatch:
+    """
+    Measures either the time or the peak memory of stages,
+    since tracing memory allocations slows the code down a lot.
+    """
+
+    def __init__(self, trace_memory: bool = False) -> None:
+        self.trace_memory = trace_memory
+        self.times: Dict[str, float] = {}
+        self.peak_memory: Dict[str, int] = {}
+
+    def measure(self, stage: str, func: Callable[[], Any]) -> Any:
+        if self.trace_memory:
+            tracemalloc.start()
+        started_at = time.perf_counter()
+        try:
+            return func()
+        finally:
+            self.times[stage] = time.perf_counter() - started_at
+            if self.trace_memory:
+                self.peak_memory[stage] = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+
+class _RecordingProfiler(Profiler):
+    """Records timings of `Sorter` phases, summing up the sections"""
+
+    def __init__(self, prefix: str, stopwatch: _Stopwatch) -> None:
+        super().__init__(NullIO())
+        self._prefix = prefix
+        self._stopwatch = stopwatch
+
+    def _write_timing(self, name: str, seconds: float) -> None:
+        if name.startswith("section ["):
+            name = "sections"
+        stage = f"{self._prefix}:{name}"
+        self._stopwatch.times[stage] = self._stopwatch.times.get(stage, 0) + seconds
+
+
+def _parse_scoped(content: str) -> None:
+    try:
+        ScopedDocument(content)
+    except ScanError:
+        pass
+
+
+def _run_sorter(path: Path, content: str, check: bool, stopwatch: _Stopwatch) -> None:
+    """Runs `Sorter` as `poetry sort` does and records its phases"""
+    path.write_text(content)
+    prefix = "sorter-check" if check else "sorter"
+    profiler = _RecordingProfiler(prefix, stopwatch)
+
+    def run() -> None:
+        profiler.start()
+        try:
+            Sorter(
+                None,
+                NullIO(),
+                check=check,
+                pyproject=PyProjectFile(path),
+                profiler=profiler,
+            ).sort()
+        finally:
+            profiler.stop()
+
+    # the whole run is traced, since phases are measured by the sorter
+    memory_stopwatch = _Stopwatch(stopwatch.trace_memory)
+    memory_stopwatch.measure(prefix, run)
+    for phase in SORTER_PHASES:
+        stage = f"{prefix}:{phase}"
+        stopwatch.times.setdefault(stage, 0.0)
+        if stopwatch.trace_memory:
+            stopwatch.peak_memory[stage] = memory_stopwatch.peak_memory[prefix]
+
+
+def _run_once(path: Path, content: str, trace_memory: bool = False) -> _Stopwatch:
+    path.write_text(content)
+    stopwatch = _Stopwatch(trace_memory)
+    pyproject = PyProjectFile(path)
+
+    data = stopwatch.measure("parse", lambda: pyproject.data)
+    stopwatch.measure("parse-scoped", lambda: _parse_scoped(content))
+    plugin_config = stopwatch.measure(
+        "config", lambda: PluginConfig.from_pyproject(data)
+    )
+    sort_optionals_separately = plugin_config.move_optionals_to_bottom
+
+    sections = [section for _, section in SectionPatterns().walk(data) if section]
+
+    def create_sorters() -> List[SortElement]:
+        return [
+            create_section_sorter(section, sort_optionals_separately)
+            for section in sections
+        ]
+
+    stopwatch.measure(
+        "check", lambda: [sorter.is_sorted() for sorter in create_sorters()]
+    )
+
+    sorters = create_sorters()
+    stopwatch.measure("sort", lambda: [sorter.sort() for sorter in sorters])
+    stopwatch.measure(
+        "apply", lambda: [sorter.apply() for sorter in sorters if sorter.has_changed()]
+    )
+    sorted_content = stopwatch.measure("serialize", data.as_string)
+    stopwatch.measure("save", lambda: write_file_atomically(path, sorted_content))
+
+    _run_sorter(path, content, True, stopwatch)
+    _run_sorter(path, content, False, stopwatch)
+    return stopwatch
+
+
+def run_benchmark(params: GeneratorParams, repeat: int) -> Dict[str, Any]:
+    """
+    Returns the median time in seconds over `repeat` runs and the peak memory
+    in bytes of each stage.
+    """
+    content = generate_pyproject(params)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir) / "pyproject.toml"
+        runs = [_run_once(path, content) for _ in range(repeat)]
+        memory_run = _run_once(path, content, trace_memory=True)
+
+    return {
+        "params": params._asdict(),
+        "size": len(content),
+        "stages": {
+            stage: {
+                "time": statistics.median(run.times[stage] for run in runs),
+                "peak_memory": memory_run.peak_memory[stage],
+            }
+            for stage in (*STAGES, *SORTER_STAGES)
+        },
+    }
+
+
+def compare_with_baseline(
+    results: Dict[str, Any], baseline: Dict[str, Any], max_slowdown: float
+) -> List[str]:
+    """Returns descriptions of stages which are slower than in the baseline"""
+    regressions = []
+    for name, scenario in results["scenarios"].items():
+        baseline_scenario = baseline.get("scenarios", {}).get(name)
+        if not baseline_scenario:
+            continue
+
+        for stage, measurement in scenario["stages"].items():
+            baseline_time = baseline_scenario["stages"].get(stage, {}).get("time")
+            if baseline_time and measurement["time"] > baseline_time * (
+                1 + max_slowdown
+            ):
+                regressions.append(
+                    f"{name}/{stage}: {measurement['time'] * 1000:.2f} ms,"
+                    f" baseline {baseline_time * 1000:.2f} ms"
+                )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    add_generator_arguments(parser)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", type=Path, help="A JSON file to write results to.")
+    parser.add_argument("--baseline", type=Path, help="A JSON file to compare with.")
+    parser.add_argument(
+        "--max-slowdown",
+        type=float,
+        default=0.2,
+        help="An allowed slowdown relative to the baseline, 0.2 means 20%%.",
+    )
+    args = parser.parse_args()
+
+    params = params_from_arguments(args)
+    # the table and array forms are measured separately unless a form is forced
+    forms = ("table", "array") if params.form == "both" else (params.form,)
+    results: Dict[str, Any] = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scenarios": {},
+    }
+    for form in forms:
+        scenario = run_benchmark(params._replace(form=form), args.repeat)
+        results["scenarios"][form] = scenario
+        for stage, measurement in scenario["stages"].items():
+            print(
+                f"{form:>6} {stage:>20}: {measurement['time'] * 1000:10.2f} ms"
+                f" {measurement['peak_memory'] / 1024:10.1f} KiB"
+            )
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + "\n")
+
+    if args.baseline:
+        regressions = compare_with_baseline(
+            results, json.loads(args.baseline.read_text()), args.max_slowdown
+        )
+        for regression in regressions:
+            print(f"Slower than the baseline: {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
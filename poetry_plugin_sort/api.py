@@ -0,0 +1,100 @@
+"""
+Sorts dependencies in the text of pyproject.toml without Poetry and cleo.
+
+The functions don't read files or environment variables and don't share any
+state, so they can be called from threads and processes of other tools:
+
+    from poetry_plugin_sort.api import check_text, sort_text
+
+    result = sort_text(content)
+    if result.changed_sections:
+        path.write_text(result.text)
+"""
+
+from __future__ import annotations
+
+from typing import Any, List, NamedTuple, Optional, Sequence, Tuple
+
+import tomlkit
+
+from poetry_plugin_sort.config import PluginConfig
+from poetry_plugin_sort.scan import ScanError, ScopedDocument
+from poetry_plugin_sort.sections import DEFAULT_SECTION_PATTERNS, SectionPatterns
+from poetry_plugin_sort.sort import (
+    SCOPED_PARSING_MIN_SIZE,
+    SortElement,
+    create_section_sorter,
+)
+
+
+__all__ = ["SortResult", "check_text", "sort_text"]
+
+
+class SortResult(NamedTuple):
+    text: str
+    changed_sections: List[str]
+
+
+def sort_text(text: str, *, optionals_to_bottom: Optional[bool] = None) -> SortResult:
+    """
+    Returns the text with sorted dependencies and dotted paths of the sections
+    which were reordered, e.g. `tool.poetry.group.dev.dependencies`.
+
+    `optionals_to_bottom` defaults to `move-optionals-to-bottom` option
+    of the `[tool.poetry-sort]` section in the text. Sections of `extra-sections`
+    option are sorted as well.
+
+    Raises `tomlkit.exceptions.TOMLKitError` if the text isn't a valid TOML.
+    """
+    data, sorters = _load(text, optionals_to_bottom)
+
+    changed_sections = []
+    for path, sorter in sorters:
+        sorter.sort()
+        if sorter.has_changed():
+            sorter.apply()
+            changed_sections.append(path)
+
+    if not changed_sections:
+        return SortResult(text, [])
+    return SortResult(data.as_string(), changed_sections)
+
+
+def check_text(text: str, *, optionals_to_bottom: Optional[bool] = None) -> List[str]:
+    """
+    Returns dotted paths of the sections which aren't sorted,
+    so an empty list means that all dependencies are sorted.
+
+    The arguments and errors are the same as of `sort_text`.
+    """
+    _, sorters = _load(text, optionals_to_bottom)
+    return [path for path, sorter in sorters if not sorter.is_sorted()]
+
+
+def _parse(text: str, section_patterns: Sequence[str]) -> Any:
+    if len(text) >= SCOPED_PARSING_MIN_SIZE:
+        try:
+            return ScopedDocument(text, section_patterns=section_patterns)
+        except ScanError:
+            pass
+    return tomlkit.parse(text)
+
+
+def _load(
+    text: str, optionals_to_bottom: Optional[bool]
+) -> Tuple[Any, List[Tuple[str, SortElement]]]:
+    """Returns the parsed text and sorters of its sections"""
+    data = _parse(text, DEFAULT_SECTION_PATTERNS)
+    plugin_config = PluginConfig.from_pyproject(data, environ={})
+    if optionals_to_bottom is None:
+        optionals_to_bottom = plugin_config.move_optionals_to_bottom
+
+    section_patterns = (*DEFAULT_SECTION_PATTERNS, *plugin_config.extra_sections)
+    if plugin_config.extra_sections and isinstance(data, ScopedDocument):
+        data = _parse(text, section_patterns)
+
+    return data, [
+        (".".join(path), create_section_sorter(section, optionals_to_bottom))
+        for path, section in SectionPatterns(section_patterns).walk(data)
+        if section
+    ]
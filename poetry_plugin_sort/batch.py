@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import errno
+import os
+import time
+
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from cleo.io.buffered_io import BufferedIO
+
+from poetry_plugin_sort.compat import PyProjectTOML
+from poetry_plugin_sort.sort import SectionResult, Sorter
+
+
+PYPROJECT_FILENAME = "pyproject.toml"
+IGNORED_DIRECTORIES = frozenset(("node_modules", "__pycache__"))
+
+
+class FileResult(NamedTuple):
+    path: str
+    success: bool
+    output: str
+    error: str
+    changed: bool = False
+    sections: Tuple[SectionResult, ...] = ()
+    time: float = 0.0
+
+
+def find_pyproject_files(directory: Path) -> List[Path]:
+    """
+    Returns pyproject.toml files found in the directory and its subdirectories,
+    skipping hidden directories such as `.git` and `.venv`.
+    """
+    paths = []
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = sorted(
+            d for d in dirs if not d.startswith(".") and d not in IGNORED_DIRECTORIES
+        )
+        if PYPROJECT_FILENAME in files:
+            paths.append(Path(root) / PYPROJECT_FILENAME)
+    return paths
+
+
+def sort_file(
+    path: str,
+    check: bool = False,
+    fail_fast: bool = False,
+    section_patterns: Optional[Sequence[str]] = None,
+) -> FileResult:
+    """Sorts dependencies in a single pyproject.toml file and captures the output"""
+    io = BufferedIO()
+    started_at = time.perf_counter()
+    sorter = None
+    try:
+        pyproject_path = Path(path)
+        if not pyproject_path.is_file():
+            # Poetry reads a missing file as an empty document, which is sorted
+            raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), path)
+
+        sorter = Sorter(
+            None,
+            io,
+            check=check,
+            pyproject=PyProjectTOML(pyproject_path),
+            fail_fast=fail_fast,
+            section_patterns=section_patterns,
+        )
+        success = sorter.sort()
+    except Exception as e:
+        io.write_error_line(str(e))
+        success = False
+
+    return FileResult(
+        path,
+        success,
+        io.fetch_output(),
+        io.fetch_error(),
+        changed=sorter is not None and sorter.changed,
+        sections=tuple(sorter.section_results) if sorter is not None else (),
+        time=time.perf_counter() - started_at,
+    )
+
+
+def sort_files(
+    paths: Iterable[str],
+    check: bool = False,
+    jobs: Optional[int] = None,
+    fail_fast: bool = False,
+    section_patterns: Optional[Sequence[str]] = None,
+) -> Iterator[FileResult]:
+    """
+    Sorts dependencies in many pyproject.toml files using a pool of `jobs`
+    processes and yields a result for each file as soon as it's finished.
+
+    With `fail_fast`, checking a file stops at its first unsorted section and
+    files which haven't been started yet are skipped after the first failure.
+
+    `section_patterns` limit sorting of each file as in `Sorter`.
+    """
+    paths = list(paths)
+    jobs = min(jobs or os.cpu_count() or 1, len(paths))
+
+    if jobs <= 1:
+        for path in paths:
+            result = sort_file(path, check, fail_fast, section_patterns)
+            yield result
+            if fail_fast and not result.success:
+                return
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures: List[Future[FileResult]] = [
+            executor.submit(sort_file, path, check, fail_fast, section_patterns)
+            for path in paths
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            yield result
+            if fail_fast and not result.success:
+                for pending_future in futures:
+                    pending_future.cancel()
+                return
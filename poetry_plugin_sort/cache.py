@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+
+from functools import lru_cache
+from importlib import metadata
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Optional
+
+from poetry_plugin_sort.utils import write_file_atomically
+
+
+if TYPE_CHECKING:
+    from poetry.config.config import Config
+
+
+CACHE_VERSION = 1
+CACHE_MAX_AGE = 30 * 24 * 60 * 60  # 30 days
+CACHE_MAX_ENTRIES = 10_000
+
+
+@lru_cache(maxsize=None)
+def get_plugin_version() -> str:
+    try:
+        return metadata.version("poetry-plugin-sort")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def get_cache_dir(poetry_config: Config) -> Path:
+    """Returns the plugin's directory inside Poetry's cache directory"""
+    return Path(poetry_config.get("cache-dir")).expanduser() / "poetry-sort"
+
+
+class SortedFilesCache:
+    """
+    Remembers content hashes of pyproject.toml files which are known to be sorted,
+    so unchanged files can be checked without parsing them.
+
+    A key covers the file content, that includes the `[tool.poetry-sort]`
+    section, all `POETRY_SORT_*` environment variables and the plugin version,
+    since another version can sort other sections.
+    """
+
+    def __init__(self, path: Path):
+        self._path = path
+        self._entries: Optional[Dict[str, float]] = None
+        self._modified = False
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    @staticmethod
+    def get_key(pyproject_path: Path) -> str:
+        digest = hashlib.sha256(pyproject_path.read_bytes())
+        digest.update(f"\0{get_plugin_version()}".encode())
+        for name, value in sorted(os.environ.items()):
+            if name.startswith("POETRY_SORT_"):
+                digest.update(f"\0{name}={value}".encode())
+        return digest.hexdigest()
+
+    def is_sorted(self, key: str) -> bool:
+        entries = self._load()
+        if key not in entries:
+            return False
+
+        entries[key] = time.time()
+        self._modified = True
+        return True
+
+    def set_sorted(self, key: str) -> None:
+        self._load()[key] = time.time()
+        self._modified = True
+
+    def save(self) -> None:
+        """Writes the cache evicting entries which haven't been used for a while"""
+        if not self._modified:
+            return
+
+        entries = self._load()
+        expired_at = time.time() - CACHE_MAX_AGE
+        recent_entries = sorted(
+            (
+                (used_at, key)
+                for key, used_at in entries.items()
+                if used_at > expired_at
+            ),
+            reverse=True,
+        )[:CACHE_MAX_ENTRIES]
+        content = {
+            "version": CACHE_VERSION,
+            "entries": {key: used_at for used_at, key in recent_entries},
+        }
+
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        write_file_atomically(self._path, json.dumps(content))
+        self._modified = False
+
+    def clear(self) -> None:
+        self._path.unlink(missing_ok=True)
+        self._entries = {}
+        self._modified = False
+
+    def _load(self) -> Dict[str, float]:
+        if self._entries is not None:
+            return self._entries
+
+        try:
+            content = json.loads(self._path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            content = {}
+
+        if isinstance(content, dict) and content.get("version") == CACHE_VERSION:
+            self._entries = dict(content.get("entries", {}))
+        else:
+            self._entries = {}
+        return self._entries
+
+
+class DeferredSortMarkers:
+    """
+    Marks pyproject.toml files whose sorting was deferred by `POETRY_SORT_DEFER`,
+    so a later run knows that the files have to be sorted.
+
+    A marker is an empty file named after the hash of the pyproject.toml path.
+    """
+
+    def __init__(self, directory: Path):
+        self._directory = directory
+
+    def mark(self, pyproject_path: Path) -> None:
+        self._directory.mkdir(parents=True, exist_ok=True)
+        self._get_marker_path(pyproject_path).touch()
+
+    def is_marked(self, pyproject_path: Path) -> bool:
+        return self._get_marker_path(pyproject_path).exists()
+
+    def unmark(self, pyproject_path: Path) -> None:
+        self._get_marker_path(pyproject_path).unlink(missing_ok=True)
+
+    def _get_marker_path(self, pyproject_path: Path) -> Path:
+        path = str(pyproject_path.resolve())
+        return self._directory / hashlib.sha256(path.encode()).hexdigest()
@@ -0,0 +1,69 @@
+"""
+A standalone `poetry-sort` command which sorts dependencies in the given
+pyproject.toml files without starting Poetry, e.g. in pre-commit hooks.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+
+from pathlib import Path
+from typing import List, Optional
+
+from cleo.io.buffered_io import BufferedIO
+from tomlkit.exceptions import TOMLKitError
+
+from poetry_plugin_sort.sort import Sorter
+from poetry_plugin_sort.utils import PyProjectFile
+
+
+def _create_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="poetry-sort",
+        description="Sorts the dependencies in pyproject.toml files.",
+    )
+    parser.add_argument("files", nargs="+", type=Path, help="pyproject.toml files")
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Don't sort, just check if already sorted.",
+    )
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Sorts or checks the files and returns a non-zero status code
+    if any file was changed or isn't sorted.
+    """
+    args = _create_parser().parse_args(argv)
+
+    exit_code = 0
+    for path in args.files:
+        io = BufferedIO()
+        try:
+            # computing content-hash of poetry.lock needs Poetry
+            sorter = Sorter(
+                None,
+                io,
+                check=args.check,
+                pyproject=PyProjectFile(path),
+                keep_lock_fresh=False,
+            )
+            if not sorter.sort() or sorter.changed:
+                exit_code = 1
+        except (OSError, TOMLKitError) as e:
+            io.write_error_line(str(e))
+            exit_code = 1
+
+        for line in io.fetch_output().splitlines():
+            print(f"{path}: {line}")
+        for line in io.fetch_error().splitlines():
+            print(f"{path}: {line}", file=sys.stderr)
+
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,414 @@
+from __future__ import annotations
+
+import copy
+import json
+import sys
+
+from functools import cached_property
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+import tomlkit
+
+from cleo.helpers import argument, option
+from cleo.io.outputs.output import Type as OutputType
+from poetry.console.commands.command import Command
+from poetry.core.factory import Factory
+from tomlkit.exceptions import TOMLKitError
+
+from poetry_plugin_sort.batch import find_pyproject_files, sort_files
+from poetry_plugin_sort.cache import (
+    DeferredSortMarkers,
+    SortedFilesCache,
+    get_cache_dir,
+)
+from poetry_plugin_sort.compat import PyProjectTOML
+from poetry_plugin_sort.sections import get_group_section_patterns
+from poetry_plugin_sort.sort import Sorter
+
+
+OUTPUT_FORMATS = ("text", "json")
+
+
+class SortCommand(Command):
+    _jobs: Optional[int]
+    _section_patterns: Optional[List[str]]
+
+    name = "sort"
+    description = "Sorts the dependencies in pyproject.toml"
+    arguments = [
+        argument(
+            "paths",
+            description="Paths to pyproject.toml files or their directories.",
+            optional=True,
+            multiple=True,
+        )
+    ]
+    options = [
+        option(
+            "check", flag=True, description="Don't sort, just check if already sorted."
+        ),
+        option(
+            "recursive",
+            "r",
+            description="Sort all pyproject.toml files found in the directory.",
+            flag=False,
+            multiple=True,
+        ),
+        option(
+            "jobs",
+            "j",
+            description="The number of processes to sort multiple files with.",
+            flag=False,
+        ),
+        option(
+            "cache",
+            flag=True,
+            description="Skip files that are known to be sorted since the last run.",
+        ),
+        option("clear-cache", flag=True, description="Clear the cache and exit."),
+        option(
+            "watch",
+            flag=True,
+            description="Keep running and sort files again when they change.",
+        ),
+        option(
+            "changed-since",
+            description="Only sort pyproject.toml files changed in git since the ref.",
+            flag=False,
+        ),
+        option(
+            "fail-fast",
+            flag=True,
+            description="Stop after the first unsorted section or failed file.",
+        ),
+        option(
+            "format",
+            description="The output format: text or json.",
+            flag=False,
+            default="text",
+        ),
+        option(
+            "group",
+            "G",
+            description="Only sort dependencies of the group.",
+            flag=False,
+            multiple=True,
+        ),
+        option(
+            "server",
+            flag=True,
+            description="Answer JSON-RPC requests to sort texts on stdin and stdout.",
+        ),
+    ]
+
+    def handle(self) -> int:
+        if self.option("format") not in OUTPUT_FORMATS:
+            self.line_error(
+                f"Invalid format {self.option('format')!r},"
+                f" use one of: {', '.join(OUTPUT_FORMATS)}."
+            )
+            return 1
+
+        try:
+            self._jobs = self._get_jobs()
+        except ValueError as e:
+            self.line_error(str(e))
+            return 1
+
+        if self.option("server"):
+            return self._serve()
+
+        try:
+            self._section_patterns = self._get_section_patterns()
+        except ValueError as e:
+            self.line_error(str(e))
+            return 1
+
+        if self.option("clear-cache"):
+            return self._clear_cache()
+
+        try:
+            paths = self._get_batch_paths()
+        except ValueError as e:
+            self.line_error(str(e))
+            return 1
+
+        if self.option("watch"):
+            return self._watch(paths or [str(self._get_pyproject().file.path)])
+
+        # a file sorted only partially isn't cached as sorted
+        use_cache = self.option("cache") and self._section_patterns is None
+        cache = self._get_cache() if use_cache else None
+        try:
+            ref = self.option("changed-since")
+            if ref:
+                return self._sort_changed_since(ref, paths, cache)
+            if paths:
+                return self._sort_batch(paths, cache)
+            if self._is_json_format():
+                # the report is collected the same way as for many files
+                return self._sort_batch([str(self._get_pyproject().file.path)], cache)
+
+            pyproject = self._get_pyproject()
+            if self._is_cached_as_sorted(cache, pyproject.file.path):
+                return 0
+
+            sorter = Sorter(
+                None,
+                self.io,
+                check=self.option("check"),
+                pyproject=pyproject,
+                fail_fast=self.option("fail-fast"),
+                section_patterns=self._section_patterns,
+            )
+            success = sorter.sort()
+            if success:
+                self._cache_as_sorted(cache, pyproject.file.path)
+                self._unmark_deferred(pyproject.file.path)
+            return 0 if success else 1
+        finally:
+            if cache is not None:
+                cache.save()
+
+    def _get_section_patterns(self) -> Optional[List[str]]:
+        """Returns patterns of sections of the `--group` options if they're passed"""
+        groups = self.option("group")
+        if not groups:
+            return None
+        return [
+            pattern for group in groups for pattern in get_group_section_patterns(group)
+        ]
+
+    def _get_batch_paths(self) -> List[str]:
+        paths = []
+        for path in map(Path, self.argument("paths")):
+            if path.is_dir():
+                path = path / "pyproject.toml"
+            paths.append(str(path))
+
+        for directory in self.option("recursive"):
+            if not Path(directory).is_dir():
+                raise ValueError(f"Directory {directory!r} doesn't exist.")
+            paths.extend(str(path) for path in find_pyproject_files(Path(directory)))
+
+        return paths
+
+    def _sort_batch(
+        self,
+        paths: List[str],
+        cache: Optional[SortedFilesCache],
+        skipped_paths: Sequence[str] = (),
+    ) -> int:
+        skipped_paths = list(skipped_paths)
+        sorted_paths = []
+        for path in paths:
+            if self._is_cached_as_sorted(cache, Path(path)):
+                skipped_paths.append(path)
+            else:
+                sorted_paths.append(path)
+
+        results = sort_files(
+            sorted_paths,
+            check=self.option("check"),
+            jobs=self._jobs,
+            fail_fast=self.option("fail-fast"),
+            section_patterns=self._section_patterns,
+        )
+
+        is_json_format = self._is_json_format()
+        file_results = []
+        failed = 0
+        for result in results:
+            file_results.append(result)
+            if not is_json_format:
+                for line in result.output.splitlines():
+                    self.line(f"{result.path}: {line}")
+                for line in result.error.splitlines():
+                    self.line_error(f"{result.path}: {line}")
+            if result.success:
+                self._cache_as_sorted(cache, Path(result.path))
+                self._unmark_deferred(Path(result.path))
+            else:
+                failed += 1
+
+        if is_json_format:
+            from poetry_plugin_sort.report import create_report
+
+            report = create_report(file_results, skipped_paths)
+            self.io.write_line(json.dumps(report), type=OutputType.RAW)
+        elif failed:
+            self.line_error(f"{failed} of {len(paths)} files failed.")
+        return 1 if failed else 0
+
+    def _sort_changed_since(
+        self, ref: str, paths: List[str], cache: Optional[SortedFilesCache]
+    ) -> int:
+        """
+        Sorts the files changed since the git ref, by default looking for
+        pyproject.toml files in the current directory, and skips others.
+        """
+        from poetry_plugin_sort.vcs import GitError, get_changed_pyproject_files
+
+        directory = Path.cwd()
+        if not paths:
+            paths = [str(path) for path in find_pyproject_files(directory)]
+
+        try:
+            changed_files = get_changed_pyproject_files(ref, directory)
+        except GitError as e:
+            self.line_error(f"Failed to get files changed since {ref}: {e}")
+            return 1
+
+        changed_paths = []
+        skipped_paths = []
+        for path in paths:
+            if Path(path).resolve() in changed_files:
+                changed_paths.append(path)
+                continue
+
+            skipped_paths.append(path)
+            if self.io.is_verbose() and not self._is_json_format():
+                self.line(f"Skip sorting {path} due to no changes since {ref}.")
+
+        if skipped_paths and not self._is_json_format():
+            self.line(
+                f"Skipped {len(skipped_paths)} of {len(paths)} files"
+                f" unchanged since {ref}."
+            )
+        return self._sort_batch(changed_paths, cache, skipped_paths)
+
+    def _get_jobs(self) -> Optional[int]:
+        """Returns the number of processes of the `--jobs` option if it's passed"""
+        jobs = self.option("jobs")
+        if jobs is None:
+            return None
+
+        try:
+            value = int(jobs)
+        except ValueError:
+            value = 0
+        if value < 1:
+            raise ValueError(
+                f"Invalid number of jobs {jobs!r}, use a positive integer."
+            )
+        return value
+
+    def _is_json_format(self) -> bool:
+        return bool(self.option("format") == "json")
+
+    def _serve(self) -> int:
+        from poetry_plugin_sort.server import SortServer
+
+        stream = self.io.input.stream or sys.stdin
+        SortServer().serve(
+            iter(stream.readline, ""),
+            lambda line: self.io.write_line(line, type=OutputType.RAW),
+        )
+        return 0
+
+    def _watch(self, paths: List[str]) -> int:
+        from poetry_plugin_sort.watch import create_watcher, watch
+
+        self._sort_batch(paths, None)
+
+        watcher = create_watcher(map(Path, paths))
+        self.line(f"Watching {len(paths)} files for changes. Press Ctrl+C to stop.")
+        try:
+            watch(watcher, self._sort_changed_files)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            watcher.close()
+        return 0
+
+    def _sort_changed_files(self, paths: List[Path]) -> None:
+        self._sort_batch([str(path) for path in paths], None)
+
+    def _get_cache(self) -> SortedFilesCache:
+        return SortedFilesCache(self._get_cache_dir() / "sorted-files.json")
+
+    def _get_cache_dir(self) -> Path:
+        """
+        Returns the cache directory configured for the current project, which
+        the plugin uses after `poetry add` too, so both share deferred markers
+        """
+        poetry = getattr(self.get_application(), "_poetry", None)
+        if poetry is not None:
+            return get_cache_dir(poetry.config)
+
+        from poetry.config.config import Config
+
+        # Poetry merges the project's poetry.toml into the global configuration
+        config = Config()
+        config.merge(copy.deepcopy(Config.create().raw()))
+        try:
+            project_directory = getattr(
+                self.get_application(), "project_directory", Path.cwd()
+            )
+            local_config_path = Factory.locate(project_directory).parent / "poetry.toml"
+            if local_config_path.exists():
+                config.merge(
+                    tomlkit.parse(local_config_path.read_text(encoding="utf-8"))
+                )
+        except (RuntimeError, OSError, TOMLKitError):
+            # a batch can be sorted outside of a project
+            pass
+        return get_cache_dir(config)
+
+    def _clear_cache(self) -> int:
+        cache = self._get_cache()
+        cache.clear()
+        self.line(f"Cache {cache.path} was cleared.")
+        return 0
+
+    def _is_cached_as_sorted(
+        self, cache: Optional[SortedFilesCache], path: Path
+    ) -> bool:
+        if cache is None:
+            return False
+
+        try:
+            is_sorted = cache.is_sorted(cache.get_key(path))
+        except OSError:
+            return False
+
+        if is_sorted and self.io.is_debug() and not self._is_json_format():
+            self.line(f"Skip sorting {path} due to cached result.")
+        return is_sorted
+
+    def _cache_as_sorted(self, cache: Optional[SortedFilesCache], path: Path) -> None:
+        if cache is None:
+            return
+
+        try:
+            cache.set_sorted(cache.get_key(path))
+        except OSError:
+            pass
+
+    @cached_property
+    def _deferred_markers(self) -> DeferredSortMarkers:
+        return DeferredSortMarkers(self._get_cache_dir() / "deferred")
+
+    def _unmark_deferred(self, path: Path) -> None:
+        """Forgets deferred sorting of the file once it's sorted"""
+        if self.option("check") or self._section_patterns is not None:
+            return
+
+        try:
+            self._deferred_markers.unmark(path)
+        except OSError:
+            pass
+
+    def _get_pyproject(self) -> PyProjectTOML:
+        """
+        Returns pyproject.toml of the current project without building
+        the Poetry model, unless the application has already built it.
+        """
+        application = self.get_application()
+        poetry = getattr(application, "_poetry", None)
+        if poetry is not None:
+            return poetry.pyproject
+
+        project_directory = getattr(application, "project_directory", Path.cwd())
+        return PyProjectTOML(Factory.locate(project_directory))
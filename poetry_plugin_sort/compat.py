@@ -0,0 +1,7 @@
+try:
+    from poetry.pyproject.toml import PyProjectTOML
+except ImportError:  # Poetry < 1.8
+    from poetry.core.pyproject.toml import PyProjectTOML  # type: ignore[assignment]
+
+
+__all__ = ["PyProjectTOML"]
@@ -1,12 +1,35 @@
-import os
+from __future__ import annotations
 
-from typing import Any, Union
+import os
 
-from poetry.poetry import Poetry
+from dataclasses import dataclass, fields
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    Union,
+    cast,
+)
 
+from poetry_plugin_sort.sections import parse_section_pattern
 from poetry_plugin_sort.utils import get_by_path
 
 
+if TYPE_CHECKING:
+    from poetry.poetry import Poetry
+    from poetry.pyproject.toml import PyProjectTOML
+
+    from poetry_plugin_sort.utils import PyProjectFile
+
+
+ENV_PREFIX = "POETRY_SORT_"
+
+
 def _strtobool(value: Union[str, bool]) -> bool:
     if isinstance(value, bool):
         return value
@@ -20,20 +43,95 @@ def _strtobool(value: Union[str, bool]) -> bool:
         raise ValueError(f"invalid truth value {value!r}")
 
 
-def _get_variable(poetry: Poetry, env_name: str, default: Any) -> Any:
-    plugin_config = get_by_path(poetry.pyproject.data, ["tool", "poetry-sort"])
-    name = env_name[len("POETRY_SORT_") :].replace("_", "-").lower()
-    if plugin_config and name in plugin_config:
-        return plugin_config[name]
+def _parse_section_patterns(value: Union[str, List[str]]) -> Tuple[str, ...]:
+    """Parses a list of patterns or a comma-separated string of them"""
+    if isinstance(value, str):
+        value = value.split(",")
+    if not isinstance(value, list) or not all(isinstance(p, str) for p in value):
+        raise ValueError(f"expected a list of section patterns, got {value!r}")
+
+    patterns = tuple(str(pattern).strip() for pattern in value if pattern.strip())
+    for pattern in patterns:
+        parse_section_pattern(pattern)
+    return patterns
+
+
+@dataclass(frozen=True)
+class PluginConfig:
+    """
+    The plugin configuration resolved once per invocation.
+
+    Each field can be set in the `[tool.poetry-sort]` section of pyproject.toml
+    by its name in kebab-case, e.g. `move-optionals-to-bottom`, or with
+    a `POETRY_SORT_<FIELD>` environment variable. The section takes precedence.
+    """
 
-    return os.environ.get(env_name, default)
+    enabled: bool = True
+    move_optionals_to_bottom: bool = False
+    # patterns of sections to sort in addition to the default ones
+    extra_sections: Tuple[str, ...] = ()
 
+    @classmethod
+    def from_pyproject(
+        cls, data: Dict[str, Any], environ: Optional[Mapping[str, str]] = None
+    ) -> PluginConfig:
+        if environ is None:
+            environ = os.environ
 
-def is_sorting_enabled(poetry: Poetry) -> bool:
-    return _strtobool(_get_variable(poetry, "POETRY_SORT_ENABLED", True))
+        plugin_config = get_by_path(data, ["tool", "poetry-sort"]) or {}
 
+        values = {}
+        for field in fields(cls):
+            name = field.name.replace("_", "-")
+            env_name = ENV_PREFIX + field.name.upper()
+            if name in plugin_config:
+                value = plugin_config[name]
+            elif env_name in environ:
+                value = environ[env_name]
+            else:
+                continue
 
-def is_sort_optionals_separately(poetry: Poetry) -> bool:
-    return _strtobool(
-        _get_variable(poetry, "POETRY_SORT_MOVE_OPTIONALS_TO_BOTTOM", False)
+            parse: Callable[[Any], Any] = (
+                _parse_section_patterns
+                if isinstance(field.default, tuple)
+                else _strtobool
+            )
+            try:
+                values[field.name] = parse(value)
+            except (AttributeError, ValueError) as e:
+                raise ValueError(f"Invalid value of {name} option: {e}") from e
+
+        return cls(**values)
+
+
+def load_config(poetry: Union[Poetry, PyProjectTOML, PyProjectFile]) -> PluginConfig:
+    pyproject = cast(
+        "Union[PyProjectTOML, PyProjectFile]", getattr(poetry, "pyproject", poetry)
     )
+    return PluginConfig.from_pyproject(pyproject.data)
+
+
+def is_sorting_enabled(poetry: Union[Poetry, PyProjectTOML, PyProjectFile]) -> bool:
+    return load_config(poetry).enabled
+
+
+def is_sort_optionals_separately(
+    poetry: Union[Poetry, PyProjectTOML, PyProjectFile],
+) -> bool:
+    return load_config(poetry).move_optionals_to_bottom
+
+
+def is_profiling_enabled() -> bool:
+    """
+    Profiling starts before pyproject.toml is read,
+    so it can be enabled only with the environment variable.
+    """
+    return _strtobool(os.environ.get("POETRY_SORT_PROFILE", False))
+
+
+def is_sorting_deferred() -> bool:
+    """
+    Deferring is a property of a script run rather than of a project,
+    so it can be enabled only with the environment variable.
+    """
+    return _strtobool(os.environ.get("POETRY_SORT_DEFER", False))
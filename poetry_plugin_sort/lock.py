@@ -0,0 +1,88 @@
+"""
+Keeps `content-hash` of poetry.lock valid when sorting reorders arrays.
+
+Poetry hashes pyproject.toml with sorted table keys, so reordering tables
+doesn't change the hash, but the order of `project.dependencies` and other
+arrays does. If the lock was fresh before sorting, only the hash is updated,
+so a slow `poetry lock` isn't needed after a cosmetic change.
+"""
+
+from __future__ import annotations
+
+import re
+
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+import tomlkit
+
+from poetry_plugin_sort.utils import write_file_atomically
+
+
+if TYPE_CHECKING:
+    from poetry.packages.locker import Locker
+
+
+LOCK_FILENAME = "poetry.lock"
+
+# arrays which Poetry hashes in the order they are written
+LOCKED_ARRAY_PATTERNS = (
+    "project.dependencies",
+    "project.optional-dependencies.*",
+    "dependency-groups.*",
+)
+
+_CONTENT_HASH_RE = re.compile(r'^content-hash = "([0-9a-f]*)"', re.MULTILINE)
+
+
+def get_lock_path(pyproject_path: Path) -> Path:
+    return pyproject_path.parent / LOCK_FILENAME
+
+
+def is_lock_fresh(lock_path: Path, pyproject_content: str) -> bool:
+    """Checks if the lock file exists and matches the content of pyproject.toml"""
+    if not lock_path.exists():
+        return False
+
+    locker = _create_locker(lock_path, pyproject_content)
+    return locker is not None and locker.is_fresh()
+
+
+def update_content_hash(lock_path: Path, pyproject_content: str) -> bool:
+    """
+    Writes the content hash of pyproject.toml to the lock file and
+    returns whether it was changed.
+    """
+    locker = _create_locker(lock_path, pyproject_content)
+    if locker is None:
+        return False
+
+    with open(lock_path, encoding="utf-8", newline="") as f:
+        lock_content = f.read()
+
+    matches = list(_CONTENT_HASH_RE.finditer(lock_content))
+    if len(matches) != 1:
+        raise ValueError(f"{lock_path.name} doesn't have a single content-hash")
+
+    [match] = matches
+    content_hash = locker._get_content_hash()
+    if match.group(1) == content_hash:
+        return False
+
+    start, end = match.span(1)
+    write_file_atomically(
+        lock_path, lock_content[:start] + content_hash + lock_content[end:]
+    )
+    return True
+
+
+def _create_locker(lock_path: Path, pyproject_content: str) -> Optional[Locker]:
+    from poetry.packages.locker import Locker
+
+    if not hasattr(Locker, "set_pyproject_data"):
+        # Poetry < 2.0 hashes only `[tool.poetry]` tables, whose order doesn't matter
+        return None
+    if not hasattr(Locker, "_get_content_hash"):
+        # a private method of Poetry, which may be gone in a new version
+        raise ValueError("Poetry doesn't provide content-hash of pyproject.toml")
+    return Locker(lock_path, tomlkit.parse(pyproject_content))
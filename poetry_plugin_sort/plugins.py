@@ -1,35 +1,34 @@
 from __future__ import annotations
 
-from typing import Type
+from typing import TYPE_CHECKING, List, Optional, Type, Union
 
 from cleo.events import console_events
 from cleo.events.console_terminate_event import ConsoleTerminateEvent
-from cleo.events.event import Event
-from cleo.events.event_dispatcher import EventDispatcher
-from cleo.helpers import option
-from cleo.io.io import IO
-from poetry.console.application import Application
-from poetry.console.commands.add import AddCommand
-from poetry.console.commands.command import Command
-from poetry.console.commands.init import InitCommand
 from poetry.plugins.application_plugin import ApplicationPlugin
 
-from poetry_plugin_sort import config
-from poetry_plugin_sort.sort import Sorter
 
+if TYPE_CHECKING:
+    from cleo.commands.command import Command as BaseCommand
+    from cleo.events.event import Event
+    from cleo.events.event_dispatcher import EventDispatcher
+    from cleo.io.io import IO
+    from poetry.console.application import Application
+    from poetry.console.commands.add import AddCommand
+    from poetry.console.commands.command import Command
+    from poetry.console.commands.init import InitCommand
+    from tomlkit import TOMLDocument
 
-class SortCommand(Command):
-    name = "sort"
-    description = "Sorts the dependencies in pyproject.toml"
-    options = [
-        option(
-            "check", flag=True, description="Don't sort, just check if already sorted."
-        )
-    ]
 
-    def handle(self) -> int:
-        sorter = Sorter(self.poetry, self.io, check=self.option("check"))
-        return 0 if sorter.sort() else 1
+# Poetry activates the plugin for every command, so the sorting machinery
+# is imported only when one of these commands needs it.
+SORT_COMMAND_NAME = "sort"
+CHANGING_COMMAND_NAMES = ("init", "add")
+
+
+def _load_sort_command() -> Command:
+    from poetry_plugin_sort.command import SortCommand
+
+    return SortCommand()
 
 
 class SortDependenciesPlugin(ApplicationPlugin):
@@ -37,13 +36,17 @@ class SortDependenciesPlugin(ApplicationPlugin):
 
     @property
     def commands(self) -> list[Type[Command]]:
+        from poetry_plugin_sort.command import SortCommand
+
         return [SortCommand]
 
     def activate(self, application: Application) -> None:
         application.event_dispatcher.add_listener(  # type: ignore[union-attr]
             console_events.TERMINATE, self.sort_dependencies
         )
-        super().activate(application)
+        application.command_loader.register_factory(
+            SORT_COMMAND_NAME, _load_sort_command
+        )
 
     def sort_dependencies(
         self, event: Event, event_name: str, dispatcher: EventDispatcher
@@ -51,7 +54,6 @@ class SortDependenciesPlugin(ApplicationPlugin):
         assert isinstance(event, ConsoleTerminateEvent)
 
         io = event.io
-        command = event.command
 
         if event.exit_code != 0:
             self._write_debug_lines(
@@ -59,10 +61,11 @@ class SortDependenciesPlugin(ApplicationPlugin):
             )
             return
 
-        if not isinstance(command, (InitCommand, AddCommand)):
+        command = self._get_changing_command(event.command)
+        if command is None:
             self._write_debug_lines(
                 io,
-                f"Skip sorting dependencies due to {command} does not change the"
+                f"Skip sorting dependencies due to {event.command} does not change the"
                 " state.",
             )
             return
@@ -73,14 +76,111 @@ class SortDependenciesPlugin(ApplicationPlugin):
             )
             return
 
-        if not config.is_sorting_enabled(command.poetry):
-            self._write_debug_lines(
-                io, "Skip sorting dependencies due to disabled sorting."
-            )
-            return
+        from poetry_plugin_sort import config
+        from poetry_plugin_sort.profiling import Profiler
+
+        profiler = Profiler(io)
+        profiler.start()
+        try:
+            with profiler.phase("config"):
+                plugin_config = config.load_config(command.poetry)
+            if not plugin_config.enabled:
+                self._write_debug_lines(
+                    io, "Skip sorting dependencies due to disabled sorting."
+                )
+                return
 
-        sorter = Sorter(command.poetry, io)
-        sorter.sort()
+            from poetry_plugin_sort.cache import DeferredSortMarkers, get_cache_dir
+
+            markers = DeferredSortMarkers(
+                get_cache_dir(command.poetry.config) / "deferred"
+            )
+            pyproject_path = command.poetry.file.path
+            if config.is_sorting_deferred():
+                markers.mark(pyproject_path)
+                self._write_debug_lines(
+                    io, "Defer sorting dependencies due to POETRY_SORT_DEFER."
+                )
+                return
+
+            from poetry_plugin_sort.sort import Sorter
+
+            if markers.is_marked(pyproject_path):
+                # deferred commands could change any section
+                section_patterns = None
+            else:
+                section_patterns = self._get_changed_section_patterns(command)
+
+            sorter = Sorter(
+                command.poetry,
+                io,
+                document=self._get_written_document(command),
+                profiler=profiler,
+                plugin_config=plugin_config,
+                section_patterns=section_patterns,
+            )
+            # scoped sorting doesn't sort sections of other deferred commands
+            if sorter.sort() and section_patterns is None:
+                markers.unmark(pyproject_path)
+        finally:
+            profiler.stop()
+
+    def _get_changing_command(
+        self, command: Optional[BaseCommand]
+    ) -> Optional[Union[InitCommand, AddCommand]]:
+        """Returns the command if it could change dependencies in pyproject.toml"""
+        if command is None or command.name not in CHANGING_COMMAND_NAMES:
+            return None
+
+        # the commands have already been imported to run them
+        from poetry.console.commands.add import AddCommand
+        from poetry.console.commands.init import InitCommand
+
+        return command if isinstance(command, (InitCommand, AddCommand)) else None
+
+    def _get_changed_section_patterns(
+        self, command: Union[InitCommand, AddCommand]
+    ) -> Optional[List[str]]:
+        """
+        Returns patterns of the sections `poetry add` could change according to
+        its `--group`, `--dev` and `--optional` options, or None to sort all sections.
+        """
+        from poetry.console.commands.add import AddCommand
+
+        from poetry_plugin_sort.sections import MAIN_GROUP, get_group_section_patterns
+
+        if not isinstance(command, AddCommand):
+            return None
+
+        if command.option("dev"):
+            group = "dev"
+        else:
+            group = command.option("group") or MAIN_GROUP
+
+        # Poetry < 2.0 has a boolean `--optional` flag without an extra name
+        extra = command.option("optional")
+        try:
+            return get_group_section_patterns(
+                group, extra if isinstance(extra, str) else None
+            )
+        except ValueError:
+            return None
+
+    def _get_written_document(
+        self, command: Union[InitCommand, AddCommand]
+    ) -> Optional[TOMLDocument]:
+        """
+        Returns the document `poetry add` has just written to pyproject.toml,
+        so it doesn't have to be parsed again.
+        """
+        from poetry.console.commands.add import AddCommand
+        from tomlkit import TOMLDocument
+
+        if not isinstance(command, AddCommand):
+            return None
+
+        document = getattr(command.poetry.locker, "_pyproject_data", None)
+        return document if isinstance(document, TOMLDocument) else None
 
     def _write_debug_lines(self, io: IO, message: str) -> None:
         if io.is_debug():
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import os
+import time
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator, Optional
+
+from poetry_plugin_sort import config
+
+
+if TYPE_CHECKING:
+    from cProfile import Profile
+
+    from cleo.io.io import IO
+
+
+TRACEMALLOC_TOP_LIMIT = 50
+
+
+class Profiler:
+    """
+    Measures phases of sorting and prints their timings with `-vvv` or
+    `POETRY_SORT_PROFILE=1`.
+
+    `POETRY_SORT_CPROFILE_OUTPUT` and `POETRY_SORT_TRACEMALLOC_OUTPUT` are paths
+    to write cProfile stats and the top of memory allocations to.
+    """
+
+    def __init__(self, io: IO):
+        self._io = io
+        self._print_timings = io.is_debug() or config.is_profiling_enabled()
+        self._cprofile_output = os.environ.get("POETRY_SORT_CPROFILE_OUTPUT")
+        self._tracemalloc_output = os.environ.get("POETRY_SORT_TRACEMALLOC_OUTPUT")
+        self._profile: Optional[Profile] = None
+        self._started_at: Optional[float] = None
+
+    def start(self) -> None:
+        if self._started_at is not None:
+            return
+        self._started_at = time.perf_counter()
+
+        if self._cprofile_output:
+            import cProfile
+
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+
+        if self._tracemalloc_output:
+            import tracemalloc
+
+            tracemalloc.start()
+
+    def stop(self) -> None:
+        if self._started_at is None:
+            return
+        self._write_timing("total", time.perf_counter() - self._started_at)
+        self._started_at = None
+
+        if self._profile is not None and self._cprofile_output:
+            self._profile.disable()
+            self._profile.dump_stats(self._cprofile_output)
+            self._profile = None
+            self._io.write_line(
+                f"cProfile stats were written to {self._cprofile_output}."
+            )
+
+        if self._tracemalloc_output:
+            import tracemalloc
+
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            lines = [f"Peak memory: {peak} B"]
+            lines += map(str, snapshot.statistics("lineno")[:TRACEMALLOC_TOP_LIMIT])
+            Path(self._tracemalloc_output).write_text("\n".join(lines) + "\n")
+            self._io.write_line(
+                f"Memory allocations were written to {self._tracemalloc_output}."
+            )
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._write_timing(name, time.perf_counter() - started_at)
+
+    def _write_timing(self, name: str, seconds: float) -> None:
+        if self._print_timings:
+            self._io.write_line(f"[poetry-sort] {name}: {seconds * 1000:.2f} ms")
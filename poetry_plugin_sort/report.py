@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List
+
+from poetry_plugin_sort.batch import FileResult
+
+
+REPORT_VERSION = 1
+
+
+def create_report(
+    results: Iterable[FileResult], skipped_paths: Iterable[str] = ()
+) -> Dict[str, Any]:
+    """
+    Returns a JSON-serializable report of sorted or checked files,
+    times are in seconds.
+    """
+    files: List[Dict[str, Any]] = []
+    for result in results:
+        files.append(
+            {
+                "path": result.path,
+                "success": result.success,
+                "changed": result.changed,
+                "errors": result.error.splitlines(),
+                "time": result.time,
+                "sections": [section._asdict() for section in result.sections],
+            }
+        )
+
+    sections = [section for file in files for section in file["sections"]]
+    skipped = list(skipped_paths)
+    return {
+        "version": REPORT_VERSION,
+        "files": files,
+        "skipped": skipped,
+        "totals": {
+            "files": len(files),
+            "skipped": len(skipped),
+            "failed": sum(1 for file in files if not file["success"]),
+            "changed": sum(1 for file in files if file["changed"]),
+            "sections": len(sections),
+            "unsorted_sections": sum(
+                1 for section in sections if not section["sorted"]
+            ),
+            "moved": sum(section["moved"] for section in sections),
+            "time": sum(file["time"] for file in files),
+        },
+    }
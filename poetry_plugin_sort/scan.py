@@ -0,0 +1,253 @@
+"""
+A section-scoped parser which finds dependency sections in pyproject.toml
+without parsing the whole file with tomlkit.
+
+The file is scanned line by line, tracking only strings, comments and brackets,
+to find where the sections matching the patterns and `[tool.poetry-sort]`
+begin and end.
+Only these sections are parsed with tomlkit, so they're sorted by the same
+`SortTable` and `SortArray` as a fully parsed document, and the rest of the file
+is kept as plain text.
+
+`ScanError` is raised when the file has a construct the scanner doesn't handle,
+e.g. a dependency section defined as an inline table or with dotted keys.
+Callers should fall back to parsing the whole file then.
+"""
+
+from __future__ import annotations
+
+import re
+
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import tomlkit
+
+from tomlkit import TOMLDocument
+from tomlkit.exceptions import TOMLKitError
+from tomlkit.items import Array, Table
+
+from poetry_plugin_sort.sections import (
+    DEFAULT_SECTION_PATTERNS,
+    KEY_PART_PATTERN,
+    KeyPath,
+    SectionPatterns,
+    parse_key_parts,
+)
+from poetry_plugin_sort.utils import get_by_path
+
+
+# the plugin configuration is read from the document as well
+CONFIG_PATTERN = "tool.poetry-sort"
+
+_DOTTED_KEY = rf"(?:{KEY_PART_PATTERN})(?:[ \t]*\.[ \t]*(?:{KEY_PART_PATTERN}))*"
+
+_KEY_PART_RE = re.compile(KEY_PART_PATTERN)
+_BLANK_LINE_RE = re.compile(r"[ \t]*(?:#[^\r\n]*)?(?:\r?\n|\Z)")
+_HEADER_RE = re.compile(
+    rf"[ \t]*(\[\[?)[ \t]*({_DOTTED_KEY})[ \t]*(\]\]?)[ \t]*(?:#[^\r\n]*)?(?:\r?\n|\Z)"
+)
+_KEY_RE = re.compile(rf"[ \t]*({_DOTTED_KEY})[ \t]*=")
+_NEXT_HEADER_RE = re.compile(r"^[ \t]*\[", re.MULTILINE)
+
+_VALUE_TOKEN_RE = re.compile(r"\"\"\"|'''|[\"'#\[\]{}\n]")
+_STRING_END_RES = {
+    '"""': re.compile(r"(?:\\.|[^\\])*?\"\"\"\"{0,2}", re.DOTALL),
+    "'''": re.compile(r".*?'''\'{0,2}", re.DOTALL),
+    '"': re.compile(r"(?:\\.|[^\"\\\n])*\""),
+    "'": re.compile(r"[^'\n]*'"),
+}
+_COMMENT_END_RE = re.compile(r"[^\n]*")
+
+
+class ScanError(Exception):
+    pass
+
+
+def _parse_key(text: str) -> KeyPath:
+    try:
+        return parse_key_parts(_KEY_PART_RE.findall(text))
+    except ValueError as e:
+        raise ScanError(str(e)) from e
+
+
+def _skip_value(content: str, position: int) -> int:
+    """Returns the position after the line where the value at `position` ends"""
+    depth = 0
+    while True:
+        match = _VALUE_TOKEN_RE.search(content, position)
+        if match is None:
+            if depth:
+                raise ScanError("Unclosed array or inline table")
+            return len(content)
+
+        token = match.group()
+        position = match.end()
+        if token == "\n":
+            if not depth:
+                return position
+        elif token in ("[", "{"):
+            depth += 1
+        elif token in ("]", "}"):
+            depth -= 1
+            if depth < 0:
+                raise ScanError("Unexpected closing bracket")
+        elif token == "#":
+            position = _COMMENT_END_RE.match(content, position).end()  # type: ignore
+        else:
+            string_end = _STRING_END_RES[token].match(content, position)
+            if string_end is None:
+                raise ScanError("Unclosed string")
+            position = string_end.end()
+
+
+def _find_sections(
+    content: str, patterns: SectionPatterns
+) -> List[Tuple[KeyPath, int, int, bool]]:
+    """
+    Returns paths, spans of the sections in the order they're in the file
+    and whether they are tables.
+    """
+    sections: List[Tuple[KeyPath, int, int, bool]] = []
+    table_path: KeyPath = ()
+    table_start: Optional[int] = None  # the start of a table section
+
+    position = 0
+    while position < len(content):
+        if table_start is not None:
+            # The body of a section is parsed by tomlkit, so jump to the next
+            # line which looks like a header. If the line is inside a multiline
+            # string or array, the section is cut off and tomlkit fails on it.
+            match = _NEXT_HEADER_RE.search(content, position)
+            position = match.start() if match else len(content)
+            if position == len(content):
+                break
+
+        match = _BLANK_LINE_RE.match(content, position)
+        if match:
+            position = match.end()
+            continue
+
+        match = _HEADER_RE.match(content, position)
+        if match:
+            opening, key, closing = match.groups()
+            if len(opening) != len(closing):
+                raise ScanError(f"Malformed table header {match.group().strip()}")
+
+            if table_start is not None:
+                sections.append((table_path, table_start, match.start(), True))
+                table_start = None
+
+            table_path = _parse_key(key)
+            if len(opening) == 1 and patterns.matches(table_path):
+                table_start = match.start()
+            elif patterns.is_inside(table_path) or (
+                len(opening) == 2
+                and (patterns.matches(table_path) or patterns.is_prefix(table_path))
+            ):
+                raise ScanError(f"Unsupported table {match.group().strip()}")
+
+            position = match.end()
+            continue
+
+        match = _KEY_RE.match(content, position)
+        if match is None:
+            raise ScanError(f"Unexpected line at position {position}")
+
+        end = _skip_value(content, match.end())
+        key = _parse_key(match.group(1))
+        path = table_path + key
+        if len(key) == 1 and patterns.matches(path):
+            sections.append((path, position, end, False))
+        elif (
+            patterns.matches(path)
+            or patterns.is_prefix(path)
+            or patterns.is_inside(path)
+        ):
+            raise ScanError(f"Unsupported key {'.'.join(path)}")
+        position = end
+
+    if table_start is not None:
+        sections.append((table_path, table_start, len(content), True))
+    return sections
+
+
+def _set_by_path(data: Dict[str, Any], path: KeyPath, value: Any) -> None:
+    for key in path[:-1]:
+        data = data.setdefault(key, {})
+    if path[-1] in data:
+        raise ScanError(f"Section {'.'.join(path)} is defined twice")
+    data[path[-1]] = value
+
+
+class ScopedDocument(Dict[str, Any]):
+    """
+    Nested dictionaries leading to the parsed sections of pyproject.toml.
+
+    `as_string()` returns the whole content where the sections are replaced
+    with their current text, as `TOMLDocument.as_string()` does.
+    """
+
+    def __init__(
+        self,
+        content: str,
+        linesep: Optional[str] = None,
+        section_patterns: Iterable[str] = DEFAULT_SECTION_PATTERNS,
+    ):
+        super().__init__()
+        self._content = content
+        self._sections: List[Tuple[int, int, TOMLDocument]] = []
+        self.linesep = linesep
+
+        patterns = SectionPatterns([*section_patterns, CONFIG_PATTERN])
+        for path, start, end, is_table in _find_sections(content, patterns):
+            snippet = content[start:end]
+            try:
+                section_document = tomlkit.parse(snippet)
+            except TOMLKitError as e:
+                raise ScanError(f"Can't parse {'.'.join(path)}: {e}") from e
+
+            if is_table:
+                section = get_by_path(section_document, list(path))
+                if not isinstance(section, Table):
+                    raise ScanError(f"Unsupported section {'.'.join(path)}")
+            else:
+                # a snippet of a value is a single `key = ...` line of its table
+                section = section_document[path[-1]]
+                if not isinstance(section, Array):
+                    raise ScanError(f"Unsupported section {'.'.join(path)}")
+
+            if section_document.as_string() != snippet:
+                raise ScanError(f"Section {'.'.join(path)} isn't preserved")
+
+            _set_by_path(self, path, section)
+            self._sections.append((start, end, section_document))
+
+    def as_string(self) -> str:
+        parts = []
+        position = 0
+        for start, end, section_document in self._sections:
+            parts += [self._content[position:start], section_document.as_string()]
+            position = end
+        parts.append(self._content[position:])
+        return "".join(parts)
+
+
+def read_scoped_document(
+    path: Path, section_patterns: Iterable[str] = DEFAULT_SECTION_PATTERNS
+) -> ScopedDocument:
+    """Reads pyproject.toml handling line endings as tomlkit's `TOMLFile` does"""
+    with open(path, encoding="utf-8", newline="") as f:
+        content = f.read()
+
+    linesep = None
+    newlines_count = content.count("\n")
+    if newlines_count:
+        windows_newlines_count = content.count("\r\n")
+        if windows_newlines_count == newlines_count:
+            linesep = "\r\n"
+            content = content.replace("\r\n", "\n")
+        elif windows_newlines_count == 0:
+            linesep = "\n"
+
+    return ScopedDocument(content, linesep, section_patterns)
@@ -0,0 +1,176 @@
+"""
+Dotted patterns of sections with dependencies, e.g. `tool.poetry.group.*.dependencies`,
+where `*` matches any key and keys with dots can be quoted as in TOML.
+
+The patterns are compiled into a tree, so a document is walked once and only
+along the keys which can lead to a section.
+"""
+
+from __future__ import annotations
+
+import re
+
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+from tomlkit.items import Array, Table
+
+
+KeyPath = Tuple[str, ...]
+
+WILDCARD = "*"
+
+# the same as `poetry.core.packages.dependency_group.MAIN_GROUP`,
+# but doesn't require importing poetry-core
+MAIN_GROUP = "main"
+
+DEFAULT_SECTION_PATTERNS = (
+    "tool.poetry.dependencies",
+    "tool.poetry.group.*.dependencies",
+    # the legacy dev group
+    "tool.poetry.dev-dependencies",
+    # https://peps.python.org/pep-0621/
+    "project.dependencies",
+    "project.optional-dependencies.*",
+    # https://peps.python.org/pep-0735/
+    "dependency-groups.*",
+)
+
+KEY_PART_PATTERN = r"[A-Za-z0-9_-]+|\"(?:[^\"\\\n]|\\.)*\"|'[^'\n]*'"
+
+_BARE_KEY_RE = re.compile(r"[A-Za-z0-9_-]+")
+_PATTERN_PART_RE = re.compile(rf"{KEY_PART_PATTERN}|\*")
+_PATTERN_RE = re.compile(
+    rf"[ \t]*(?:{_PATTERN_PART_RE.pattern})"
+    rf"(?:[ \t]*\.[ \t]*(?:{_PATTERN_PART_RE.pattern}))*[ \t]*"
+)
+
+
+def parse_key_parts(parts: Iterable[str]) -> KeyPath:
+    """Returns keys of bare or quoted parts of a dotted key"""
+    keys = []
+    for part in parts:
+        if part[0] == '"':
+            if "\\" in part:
+                raise ValueError(f"Escaped key {part} isn't supported")
+            part = part[1:-1]
+        elif part[0] == "'":
+            part = part[1:-1]
+        keys.append(part)
+    return tuple(keys)
+
+
+def parse_section_pattern(pattern: str) -> KeyPath:
+    if not _PATTERN_RE.fullmatch(pattern):
+        raise ValueError(f"Invalid section pattern {pattern!r}")
+    return parse_key_parts(_PATTERN_PART_RE.findall(pattern))
+
+
+def quote_key(key: str) -> str:
+    """Returns the key as a part of a pattern which matches only this key"""
+    if _BARE_KEY_RE.fullmatch(key):
+        return key
+    if '"' in key and "'" not in key:
+        return f"'{key}'"
+    if '"' in key or "\\" in key or "\n" in key:
+        raise ValueError(f"Key {key!r} can't be a part of a section pattern")
+    return f'"{key}"'
+
+
+def get_group_section_patterns(group: str, extra: Optional[str] = None) -> List[str]:
+    """
+    Returns patterns of sections which can contain dependencies of the Poetry group.
+    Optional dependencies of the main group are limited to the `extra` if it's passed.
+    """
+    if group != MAIN_GROUP:
+        patterns = [
+            f"tool.poetry.group.{quote_key(group)}.dependencies",
+            f"dependency-groups.{quote_key(group)}",
+        ]
+        if group == "dev":
+            # the legacy dev group
+            patterns.append("tool.poetry.dev-dependencies")
+        return patterns
+
+    extra_key = quote_key(extra) if extra is not None else WILDCARD
+    return [
+        "tool.poetry.dependencies",
+        "project.dependencies",
+        f"project.optional-dependencies.{extra_key}",
+    ]
+
+
+class _Node:
+    __slots__ = ("children", "is_section")
+
+    def __init__(self) -> None:
+        self.children: Dict[str, _Node] = {}
+        self.is_section = False
+
+
+class SectionPatterns:
+    def __init__(self, patterns: Iterable[str] = DEFAULT_SECTION_PATTERNS):
+        self._root = _Node()
+        for pattern in patterns:
+            node = self._root
+            for key in parse_section_pattern(pattern):
+                node = node.children.setdefault(key, _Node())
+            node.is_section = True
+
+    def matches(self, path: KeyPath) -> bool:
+        """Checks if the path is a section"""
+        return any(node.is_section for node in self._find_nodes(path))
+
+    def is_prefix(self, path: KeyPath) -> bool:
+        """Checks if sections can be nested in the path"""
+        return any(node.children for node in self._find_nodes(path))
+
+    def is_inside(self, path: KeyPath) -> bool:
+        """Checks if the path is nested in a section"""
+        return any(self.matches(path[:length]) for length in range(1, len(path)))
+
+    def walk(self, data: Mapping[str, Any]) -> Iterator[Tuple[KeyPath, Any]]:
+        """
+        Yields paths and values of tables and arrays which match the patterns.
+        Sections aren't searched inside other sections.
+        """
+        yield from self._walk(data, [self._root], ())
+
+    def _walk(
+        self, value: Any, nodes: List[_Node], path: KeyPath
+    ) -> Iterator[Tuple[KeyPath, Any]]:
+        if any(node.is_section for node in nodes):
+            if isinstance(value, (Table, Array)):
+                yield path, value
+            return
+
+        if not isinstance(value, Mapping):
+            return
+
+        if any(WILDCARD in node.children for node in nodes):
+            keys: Iterable[str] = list(value.keys())
+        else:
+            keys = dict.fromkeys(key for node in nodes for key in node.children)
+
+        for key in keys:
+            if key not in value:
+                continue
+
+            child_nodes = [
+                child
+                for node in nodes
+                for child in (node.children.get(key), node.children.get(WILDCARD))
+                if child is not None
+            ]
+            if child_nodes:
+                yield from self._walk(value[key], child_nodes, path + (key,))
+
+    def _find_nodes(self, path: KeyPath) -> List[_Node]:
+        nodes = [self._root]
+        for key in path:
+            nodes = [
+                child
+                for node in nodes
+                for child in (node.children.get(key), node.children.get(WILDCARD))
+                if child is not None
+            ]
+        return nodes
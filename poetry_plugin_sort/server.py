@@ -0,0 +1,134 @@
+"""
+A JSON-RPC 2.0 server which sorts the text of pyproject.toml for editors,
+so the interpreter and Poetry are started once instead of on every save.
+
+Each request and response is a JSON object on a single line:
+
+    --> {"jsonrpc": "2.0", "id": 1, "method": "sort", "params": {"text": "..."}}
+    <-- {"jsonrpc": "2.0", "id": 1, "result": {"text": "...", "changedSections": []}}
+
+Methods:
+
+* `sort` returns `text` with sorted dependencies and `changedSections`.
+* `check` returns `unsortedSections`, which is empty if everything is sorted.
+* `shutdown` stops the server after the response.
+
+`sort` and `check` take the `text` of pyproject.toml and an optional
+`optionalsToBottom` flag which defaults to the option in the text.
+"""
+
+from __future__ import annotations
+
+import json
+
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from tomlkit.exceptions import TOMLKitError
+
+from poetry_plugin_sort.api import check_text, sort_text
+
+
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+# the text of a request isn't a valid pyproject.toml
+INVALID_TOML = -32000
+
+
+class RequestError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(code, message)
+        self.code = code
+        self.message = message
+
+    def __str__(self) -> str:
+        return self.message
+
+
+def _get_text_params(params: Any) -> Dict[str, Any]:
+    if not isinstance(params, dict) or not isinstance(params.get("text"), str):
+        raise RequestError(INVALID_PARAMS, "params.text must be a string")
+
+    optionals_to_bottom = params.get("optionalsToBottom")
+    if optionals_to_bottom is not None and not isinstance(optionals_to_bottom, bool):
+        raise RequestError(INVALID_PARAMS, "params.optionalsToBottom must be a boolean")
+
+    return {"text": params["text"], "optionals_to_bottom": optionals_to_bottom}
+
+
+def _sort(params: Any) -> Dict[str, Any]:
+    result = sort_text(**_get_text_params(params))
+    return {"text": result.text, "changedSections": result.changed_sections}
+
+
+def _check(params: Any) -> Dict[str, Any]:
+    return {"unsortedSections": check_text(**_get_text_params(params))}
+
+
+class SortServer:
+    def __init__(self) -> None:
+        self.running = True
+        self._methods: Dict[str, Callable[[Any], Any]] = {
+            "sort": _sort,
+            "check": _check,
+            "shutdown": self._shutdown,
+        }
+
+    def serve(self, lines: Iterable[str], write_line: Callable[[str], None]) -> None:
+        """Answers requests from the lines until they end or `shutdown` is called"""
+        for line in lines:
+            if not line.strip():
+                continue
+
+            response = self.handle_message(line)
+            if response is not None:
+                write_line(json.dumps(response))
+            if not self.running:
+                break
+
+    def handle_message(self, message: str) -> Optional[Dict[str, Any]]:
+        """Returns a response to the message or None if it's a notification"""
+        request_id = None
+        try:
+            try:
+                request = json.loads(message)
+            except ValueError as e:
+                raise RequestError(PARSE_ERROR, f"Invalid JSON: {e}") from e
+
+            if not isinstance(request, dict):
+                raise RequestError(INVALID_REQUEST, "A request must be an object")
+            request_id = request.get("id")
+
+            method = request.get("method")
+            if request.get("jsonrpc") != "2.0" or not isinstance(method, str):
+                raise RequestError(INVALID_REQUEST, "Invalid JSON-RPC 2.0 request")
+            if method not in self._methods:
+                raise RequestError(METHOD_NOT_FOUND, f"Unknown method {method!r}")
+
+            try:
+                result = self._methods[method](request.get("params"))
+            except TOMLKitError as e:
+                raise RequestError(INVALID_TOML, str(e)) from e
+            except ValueError as e:
+                # invalid options in the `[tool.poetry-sort]` section of the text
+                raise RequestError(INVALID_PARAMS, str(e)) from e
+            except RequestError:
+                raise
+            except Exception as e:
+                # keep the server running for the next requests
+                raise RequestError(INTERNAL_ERROR, f"{type(e).__name__}: {e}") from e
+        except RequestError as e:
+            return {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "error": {"code": e.code, "message": e.message},
+            }
+
+        if "id" not in request:
+            return None
+        return {"jsonrpc": "2.0", "id": request_id, "result": result}
+
+    def _shutdown(self, params: Any) -> None:
+        self.running = False
@@ -1,71 +1,215 @@
-from functools import partial
-from typing import Any, List, Optional, Tuple
-
-from cleo.io.io import IO
-from poetry.core.packages.dependency_group import MAIN_GROUP
-from poetry.poetry import Poetry
-from tomlkit.items import Array, Item, Key, String, Table, Whitespace
+from __future__ import annotations
+
+import time
+
+from bisect import bisect_right
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from tomlkit import TOMLDocument
+from tomlkit.exceptions import TOMLKitError
+from tomlkit.items import Item, Key, Null, String, Table, Whitespace
 from tomlkit.items import _ArrayItemGroup as ArrayItemGroup
 
-from poetry_plugin_sort import config
-from poetry_plugin_sort.utils import get_by_path
+from poetry_plugin_sort.config import PluginConfig
+from poetry_plugin_sort.lock import (
+    LOCK_FILENAME,
+    LOCKED_ARRAY_PATTERNS,
+    get_lock_path,
+    is_lock_fresh,
+    update_content_hash,
+)
+from poetry_plugin_sort.profiling import Profiler
+from poetry_plugin_sort.scan import ScanError, ScopedDocument, read_scoped_document
+from poetry_plugin_sort.sections import (
+    DEFAULT_SECTION_PATTERNS,
+    SectionPatterns,
+    parse_section_pattern,
+)
+from poetry_plugin_sort.utils import convert_line_endings, splice, write_file_atomically
+
+
+if TYPE_CHECKING:
+    from cleo.io.io import IO
+    from poetry.poetry import Poetry
+    from poetry.pyproject.toml import PyProjectTOML
+
+    from poetry_plugin_sort.utils import PyProjectFile
+
+
+# the maximum number of unsorted items at the end of a section, e.g. packages
+# appended by `poetry add`, which are inserted into the sorted part one by one
+# instead of sorting the whole section
+INCREMENTAL_SORT_MAX_ITEMS = 32
+
+
+# the minimum size of pyproject.toml in bytes which is read by the section-scoped
+# parser, smaller files are fully parsed and validated by tomlkit as cheaply
+SCOPED_PARSING_MIN_SIZE = 32 * 1024
+
+
+# (segment, weight, item-string), see `SortElement._extract_comparison_keys`
+ComparisonKey = Tuple[int, int, str]
 
 
 class SortElement:
     def __init__(self, element, sort_optionals_separately: bool):
         self._element = element
         self._sort_optionals_separately = sort_optionals_separately
+        self._order: Optional[List[int]] = None
+        self._sorted_prefix_length = 0
+        self._insert_positions: Optional[List[int]] = None
 
     def apply(self):
         raise NotImplementedError
 
     def has_changed(self) -> bool:
-        raise NotImplementedError
+        if self._order is None:
+            return False
+        return any(idx != position for position, idx in enumerate(self._order))
+
+    def count_moved(self) -> int:
+        """Returns the number of packages which are moved by the sorting"""
+        if self._order is None:
+            return 0
+
+        items = self._get_items()
+        return sum(
+            1
+            for position, idx in enumerate(self._order)
+            if idx != position and self._get_package_name(items[idx])[0]
+        )
+
+    def is_sorted(self) -> bool:
+        """
+        Checks if the items are already sorted without sorting them.
+
+        It walks the items once from the bottom and stops at the first item
+        which is greater than the one below it.
+        """
+        following_key: Optional[ComparisonKey] = None
+        for key in self._iter_comparison_keys_reversed(self._get_items()):
+            if following_key is not None and key > following_key:
+                return False
+            following_key = key
+        return True
 
     def sort(self):
+        if self._order is not None:
+            return
+
+        keys = self._extract_comparison_keys(self._get_items())
+
+        prefix_length = min(1, len(keys))
+        while prefix_length < len(keys) and (
+            keys[prefix_length - 1] <= keys[prefix_length]
+        ):
+            prefix_length += 1
+
+        if len(keys) - prefix_length > INCREMENTAL_SORT_MAX_ITEMS:
+            self._order = sorted(range(len(keys)), key=keys.__getitem__)
+            return
+
+        # Insert the trailing items into the sorted prefix by binary search.
+        # `bisect_right` places an item after equal ones, so the result is
+        # the same as the stable `sorted()` gives.
+        self._order = list(range(prefix_length))
+        self._sorted_prefix_length = prefix_length
+        self._insert_positions = []
+        sorted_keys = keys[:prefix_length]
+        for idx in range(prefix_length, len(keys)):
+            position = bisect_right(sorted_keys, keys[idx])
+            sorted_keys.insert(position, keys[idx])
+            self._order.insert(position, idx)
+            self._insert_positions.append(position)
+
+    def _get_items(self) -> List[Any]:
         raise NotImplementedError
 
+    def _reorder_items(self) -> None:
+        """Reorders items of the element in place according to the sorting"""
+        items = self._get_items()
+        if self._insert_positions is None:
+            items[:] = [items[idx] for idx in self._order or range(len(items))]
+            return
+
+        # leave the sorted prefix untouched and only move the trailing items
+        trailing_items = items[self._sorted_prefix_length :]
+        del items[self._sorted_prefix_length :]
+        for item, position in zip(trailing_items, self._insert_positions):
+            items.insert(position, item)
+
     def _get_package_name(self, item: Any) -> Tuple[Optional[str], bool]:
         raise NotImplementedError
 
-    def _extract_comparison_key(self, item: Any, items: List[Any]) -> Tuple[int, str]:
+    def _is_fixed_item(self, item: Any) -> bool:
+        """Checks if the item isn't a package, but must stay in place"""
+        return False
+
+    def _extract_comparison_keys(self, items: List[Any]) -> List[ComparisonKey]:
         """
-        Returns a tuple of 2 elements `(weight, item-string)` which will
-        be used as a comparison key.
+        Returns a list of comparison keys, one per item, in a single reverse pass.
 
-        The tuple consists of:
+        Each key is a tuple of 3 elements `(segment, weight, item-string)`:
+        * segment - a number of a run of items between fixed items, e.g.
+            `{ include-group = "test" }` in an array, which stay in place.
         * weight - an integer to group similar items. For instance, it
             helps to move optional dependencies to the bottom.
         * item-string - a string represented the item. It can be:
             - a package name if the item contains a python package;
             - `chr(0)` if the item is a comment related to a python version;
             - `chr(1)` if the item is a python version;
-            - `chr(127)` if the item is a python version.
-        """
-        package_name, _ = self._get_package_name(item)
+            - `chr(127)` if the item is a whitespace.
 
-        if package_name:
-            weight = self._get_item_weight(item)
-            if package_name == "python":
-                return weight, chr(1)
-            return weight, package_name
-
-        # attach the comment line to a downstream python package
-        idx = items.index(item)
-        for next_item in items[idx + 1 :]:
-            next_package_name, _ = self._get_package_name(next_item)
-            if not next_package_name:
+        A comment or whitespace line inherits the key of the next package
+        or fixed item below it, so it is moved together with that item.
+        """
+        keys = list(self._iter_comparison_keys_reversed(items))
+        keys.reverse()
+        return keys
+
+    def _iter_comparison_keys_reversed(
+        self, items: List[Any]
+    ) -> Iterator[ComparisonKey]:
+        """Yields comparison keys of the items starting from the last one"""
+        next_key: Optional[ComparisonKey] = None
+        segment = 0
+
+        for idx in range(len(items) - 1, -1, -1):
+            if self._is_fixed_item(items[idx]):
+                # the item goes after the packages above it and before the ones
+                # below it, so packages are sorted only between fixed items
+                segment -= 1
+                next_key = (segment, 10, "")
+                yield next_key
                 continue
 
-            weight = self._get_item_weight(next_item)
-            if next_package_name == "python":
-                return weight, chr(0)
-            return weight, next_package_name
+            package_name, is_required = self._get_package_name(items[idx])
 
-        weight = self._get_item_weight(item)
-        return weight, chr(127)  # whitespace
+            if not package_name:
+                # attach the comment line to a downstream python package
+                yield next_key or (segment, 9, chr(127))
+                continue
 
-    def _get_item_weight(self, item: Tuple[Optional[Key], Item]) -> int:
+            weight = self._get_item_weight(package_name, is_required)
+            if package_name == "python":
+                next_key = (segment, weight, chr(0))
+                yield segment, weight, chr(1)
+            else:
+                next_key = (segment, weight, package_name)
+                yield next_key
+
+    def _get_item_weight(self, package_name: Optional[str], is_required: bool) -> int:
         """
         Returns a weight for grouping similar items.
 
@@ -74,8 +218,6 @@ class SortElement:
         * 2 if the item is an optional package
         * 9 if the item is a whitespace
         """
-        package_name, is_required = self._get_package_name(item)
-
         if not package_name:
             return 9
 
@@ -86,25 +228,11 @@ class SortElement:
 
 
 class SortTable(SortElement):
-    def __init__(self, element: Table, sort_optionals_separately: bool):
-        super().__init__(element, sort_optionals_separately)
-        self._sorted_body = None
-
     def apply(self):
-        self._element.value._body = self._sorted_body
-
-    def has_changed(self):
-        if self._sorted_body is not None:
-            return self._element.value._body != self._sorted_body
-
-    def sort(self):
-        if self._sorted_body is not None:
-            return
+        self._reorder_items()
 
-        self._sorted_body = sorted(  # type: ignore
-            self._element.value._body,
-            key=partial(self._extract_comparison_key, items=self._element.value._body),
-        )
+    def _get_items(self) -> List[Tuple[Optional[Key], Item]]:
+        return self._element.value._body
 
     def _get_package_name(
         self, item: Tuple[Optional[Key], Item]
@@ -121,37 +249,23 @@ class SortTable(SortElement):
 
 
 class SortArray(SortElement):
-    def __init__(self, element: Array, sort_optionals_separately: bool):
-        super().__init__(element, sort_optionals_separately)
-        self._sorted_value = None
-
     def apply(self):
-        self._element._value = self._sorted_value
+        self._reorder_items()
         self._element._reindex()
 
-        # ensure all package items have a comma at the end expect for the last one
-        package_items = [
+        # ensure all value items have a comma at the end expect for the last one
+        value_items = [
             item
             for item in self._element._value  # type: ignore
-            if isinstance(item.value, String)
+            if item.value is not None and not isinstance(item.value, Null)
         ]
-        for item in package_items[:-1]:
+        for item in value_items[:-1]:
             if not item.comma:
                 item.comma = Whitespace(",")
-        package_items[-1].comma = None
-
-    def has_changed(self):
-        if self._sorted_value is not None:
-            return self._element._value != self._sorted_value
+        value_items[-1].comma = None
 
-    def sort(self):
-        if self._sorted_value is not None:
-            return
-
-        self._sorted_value = sorted(  # type: ignore
-            self._element._value,
-            key=partial(self._extract_comparison_key, items=self._element._value),
-        )
+    def _get_items(self) -> List[ArrayItemGroup]:
+        return self._element._value
 
     def _get_package_name(self, item: ArrayItemGroup) -> Tuple[Optional[str], bool]:
         line_value = item.value
@@ -159,70 +273,349 @@ class SortArray(SortElement):
             return line_value.lower(), True
         return None, True
 
+    def _is_fixed_item(self, item: ArrayItemGroup) -> bool:
+        # e.g. `{ include-group = "test" }` of PEP 735 dependency groups
+        return item.value is not None and not isinstance(item.value, (String, Null))
+
+
+def create_section_sorter(section: Any, sort_optionals_separately: bool) -> SortElement:
+    """Returns a sorter for a dependency table or array"""
+    if isinstance(section, Table):
+        return SortTable(section, sort_optionals_separately)
+    return SortArray(section, sort_optionals_separately)
+
+
+class SectionResult(NamedTuple):
+    """
+    The outcome of sorting a dependency section, `moved` is the number of
+    packages which were moved, so it's always 0 in the check mode.
+    """
+
+    path: str
+    sorted: bool
+    moved: int
+    time: float
+
 
 class Sorter:
-    def __init__(self, poetry: Poetry, io: IO, check: bool = False):
+    def __init__(
+        self,
+        poetry: Optional[Poetry],
+        io: IO,
+        check: bool = False,
+        pyproject: Optional[Union[PyProjectTOML, PyProjectFile]] = None,
+        document: Optional[TOMLDocument] = None,
+        fail_fast: bool = False,
+        profiler: Optional[Profiler] = None,
+        plugin_config: Optional[PluginConfig] = None,
+        section_patterns: Optional[Sequence[str]] = None,
+        keep_lock_fresh: bool = True,
+    ):
+        """
+        Either `poetry` or `pyproject` must be passed. Dependency sections are
+        discovered from the TOML document itself, so building the whole Poetry
+        model can be skipped.
+
+        `document` is an already parsed content of pyproject.toml. It's used
+        instead of re-reading the file if it's still up-to-date with the file.
+        Otherwise, large files without `poetry` are read by the section-scoped
+        parser, which parses only dependency sections.
+
+        With `check` and `fail_fast`, checking stops at the first unsorted section.
+
+        A passed `profiler` must be started and stopped by the caller,
+        otherwise the sorter profiles itself from creating till the end of `sort()`.
+
+        `plugin_config` is resolved from the document unless it's passed.
+
+        `section_patterns` limit sorting to the matching sections instead of
+        the default and extra ones, e.g. to the sections of a single group.
+
+        `keep_lock_fresh` checks and updates content-hash of poetry.lock
+        after reordering hashed arrays. It imports Poetry to compute the hash.
+        """
+        if pyproject is None:
+            assert poetry is not None, "Either poetry or pyproject must be passed"
+            pyproject = poetry.pyproject
+
         self._poetry = poetry
+        self._pyproject = pyproject
         self._io = io
-        self._sort_optionals_separately = config.is_sort_optionals_separately(poetry)
         self._check = check
+        self._fail_fast = fail_fast
+        self._keep_lock_fresh = keep_lock_fresh
         self._success = True
+        self._changed = False
+        self._changed_sections: List[Tuple[str, str]] = []
+        # paths of reordered or unsorted arrays which Poetry hashes for the lock
+        self._locked_array_paths: List[str] = []
+        self._section_results: List[SectionResult] = []
+
+        self._owns_profiler = profiler is None
+        self._profiler = profiler or Profiler(io)
+        if self._owns_profiler:
+            self._profiler.start()
+
+        self._data: Union[TOMLDocument, ScopedDocument]
+        with self._profiler.phase("load"):
+            if document is not None and self._is_document_current(document):
+                self._data = document
+            else:
+                self._data = self._read_document()
+
+        if plugin_config is None:
+            with self._profiler.phase("config"):
+                plugin_config = PluginConfig.from_pyproject(self._data)
+        self._sort_optionals_separately = plugin_config.move_optionals_to_bottom
 
-        self._poetry.pyproject.reload()  # reset possibly outdated `pyproject.data`
+        if section_patterns is None:
+            section_patterns = (
+                *DEFAULT_SECTION_PATTERNS,
+                *plugin_config.extra_sections,
+            )
+        self._section_patterns = SectionPatterns(section_patterns)
+        self._locked_array_patterns = SectionPatterns(LOCKED_ARRAY_PATTERNS)
+        default_patterns = SectionPatterns()
+        if isinstance(self._data, ScopedDocument) and not all(
+            default_patterns.matches(parse_section_pattern(pattern))
+            for pattern in section_patterns
+        ):
+            # the document was scanned before the patterns were known
+            with self._profiler.phase("load"):
+                self._data = self._read_document(section_patterns)
 
     def sort(self) -> bool:
-        """Sorts dependencies from all groups and writes changes to pyproject.toml"""
-        group_names = self._poetry.package.dependency_group_names(include_optional=True)
-        for group in group_names:
-            if group == MAIN_GROUP:
-                dependency_toml_path = ["tool", "poetry", "dependencies"]
+        """
+        Sorts dependencies in all sections matching the patterns
+        and writes changes to pyproject.toml
+        """
+        try:
+            for path, section in self._section_patterns.walk(self._data):
+                self._sort_dependencies_by_path(list(path), section)
+                if self._fail_fast and not self._success:
+                    break
+
+            if self._check:
+                if self._locked_array_paths:
+                    self._check_lock()
             else:
-                dependency_toml_path = [
-                    "tool",
-                    "poetry",
-                    "group",
-                    group,
-                    "dependencies",
-                ]
+                if self._changed:
+                    original_content = self._read_locked_content()
+                    with self._profiler.phase("save"):
+                        content = self._save()
+                    if original_content is not None:
+                        with self._profiler.phase("lock"):
+                            self._update_lock(original_content, content)
+                    self._io.write_line("Dependencies were sorted.")
+                else:
+                    self._io.write_line("Dependencies are already sorted.")
+        finally:
+            if self._owns_profiler:
+                self._profiler.stop()
+        return self._success
 
-            self._sort_dependencies_by_path(dependency_toml_path)
+    @property
+    def changed(self) -> bool:
+        """Whether any dependency section was reordered"""
+        return self._changed
+
+    @property
+    def section_results(self) -> List[SectionResult]:
+        """Results of the sorted or checked sections in the order of sorting"""
+        return self._section_results
+
+    def _check_lock(self) -> None:
+        """Warns if sorting would make poetry.lock outdated"""
+        path = self._pyproject.file.path
+        try:
+            is_fresh = is_lock_fresh(
+                get_lock_path(path), path.read_text(encoding="utf-8")
+            )
+        except (OSError, ValueError, TOMLKitError):
+            return
 
-        # sort the legacy dev group
-        self._sort_dependencies_by_path(["tool", "poetry", "dev-dependencies"])
+        if is_fresh:
+            self._io.write_error_line(
+                f"Sorting {', '.join(self._locked_array_paths)} will change"
+                f" content-hash of {LOCK_FILENAME}, so the plugin will update it"
+                " when sorting."
+            )
 
-        # https://peps.python.org/pep-0508/
-        self._sort_dependencies_by_path(["project", "dependencies"])
+    def _read_locked_content(self) -> Optional[str]:
+        """
+        Returns the content of pyproject.toml before saving if sorting
+        could change content-hash of poetry.lock
+        """
+        if not self._locked_array_paths:
+            return None
 
-        if not self._check:
-            self._poetry.pyproject.save()
-            self._io.write_line("Dependencies were sorted.")
-        return self._success
+        try:
+            return self._pyproject.file.path.read_text(encoding="utf-8")
+        except OSError:
+            return None
+
+    def _update_lock(self, original_content: str, content: str) -> None:
+        """
+        Updates content-hash of poetry.lock if it was fresh before sorting,
+        so only the order of the locked dependencies has changed.
+        """
+        lock_path = get_lock_path(self._pyproject.file.path)
+        try:
+            if not is_lock_fresh(lock_path, original_content):
+                return
+            updated = update_content_hash(lock_path, content)
+        except (OSError, ValueError, TOMLKitError) as e:
+            self._io.write_error_line(
+                f"Failed to update content-hash of {LOCK_FILENAME}, run `poetry lock`"
+                f" to refresh it: {e}"
+            )
+            return
+
+        if updated:
+            self._io.write_line(
+                f"Updated content-hash of {LOCK_FILENAME} due to reordered"
+                f" {', '.join(self._locked_array_paths)}."
+            )
+
+    def _read_document(
+        self, section_patterns: Iterable[str] = DEFAULT_SECTION_PATTERNS
+    ) -> Union[TOMLDocument, ScopedDocument]:
+        if self._poetry is None:
+            scoped_document = self._read_scoped_document(section_patterns)
+            if scoped_document is not None:
+                return scoped_document
+
+        self._pyproject.reload()  # reset possibly outdated `pyproject.data`
+        return self._pyproject.data
+
+    def _read_scoped_document(
+        self, section_patterns: Iterable[str]
+    ) -> Optional[ScopedDocument]:
+        path = self._pyproject.file.path
+        try:
+            if path.stat().st_size < SCOPED_PARSING_MIN_SIZE:
+                return None
+            return read_scoped_document(path, section_patterns)
+        except (OSError, UnicodeDecodeError):
+            return None  # let tomlkit report the error
+        except ScanError as e:
+            if self._io.is_debug():
+                self._io.write_line(f"Parsing the whole {path.name}: {e}")
+            return None
+
+    def _is_document_current(self, document: TOMLDocument) -> bool:
+        """Checks if the document has the same content as pyproject.toml"""
+        path = self._pyproject.file.path
+        try:
+            content = path.read_text(encoding="utf-8")
+        except OSError:
+            return False
+
+        # `read_text` translates line endings to "\n" the same way
+        return content == document.as_string().replace("\r\n", "\n")
+
+    def _save(self) -> str:
+        """
+        Writes the sorted document to pyproject.toml replacing it atomically
+        and returns the written content
+        """
+        pyproject_file = self._pyproject.file
+
+        if isinstance(self._data, ScopedDocument):
+            # the document knows where its sections are, so nothing is searched
+            content = convert_line_endings(self._data.as_string(), self._data.linesep)
+        else:
+            # keep line endings the file was read with, as `TOMLFile.write` does
+            linesep = getattr(pyproject_file, "_linesep", None)
+            content = self._splice_changed_sections(linesep) or convert_line_endings(
+                self._data.as_string(), linesep
+            )
+
+        write_file_atomically(pyproject_file.path, content)
+        return content
+
+    def _splice_changed_sections(self, linesep: Optional[str]) -> Optional[str]:
+        """
+        Returns the file content where only the text of reordered sections is
+        replaced, so the rest of the document isn't serialized again.
+
+        Returns None if the text of a section can't be found unambiguously.
+        """
+        if linesep not in ("\n", "\r\n"):
+            return None
+
+        try:
+            with open(self._pyproject.file.path, encoding="utf-8", newline="") as f:
+                content = f.read()
+        except OSError:
+            return None
+
+        return splice(
+            content,
+            [
+                (
+                    convert_line_endings(original_text, linesep),
+                    convert_line_endings(sorted_text, linesep),
+                )
+                for original_text, sorted_text in self._changed_sections
+            ],
+        )
 
-    def _sort_dependencies_by_path(self, path: List[str]) -> None:
-        dependency_section = get_by_path(self._poetry.pyproject.data, path)
+    def _sort_dependencies_by_path(
+        self, path: List[str], dependency_section: Any
+    ) -> None:
         if not dependency_section:
             return
 
         if self._io.is_debug():
             self._io.write_line(f'Sorting items in [{".".join(path)}].')
 
-        dependency_section_sorter: SortElement
-        if isinstance(dependency_section, Table):
-            dependency_section_sorter = SortTable(
-                dependency_section, self._sort_optionals_separately
-            )
-        else:
-            dependency_section_sorter = SortArray(
-                dependency_section, self._sort_optionals_separately
-            )
+        section_path = ".".join(path)
+        started_at = time.perf_counter()
+        with self._profiler.phase(f"section [{section_path}]"):
+            is_sorted, moved = self._sort_dependency_section(path, dependency_section)
+        elapsed = time.perf_counter() - started_at
+        self._section_results.append(
+            SectionResult(section_path, is_sorted, moved, elapsed)
+        )
 
-        dependency_section_sorter.sort()
+    def _sort_dependency_section(
+        self, path: List[str], dependency_section: Any
+    ) -> Tuple[bool, int]:
+        """Returns whether the section was already sorted and how many packages moved"""
+        dependency_section_sorter = create_section_sorter(
+            dependency_section, self._sort_optionals_separately
+        )
 
         if self._check:
-            if dependency_section_sorter.has_changed():
-                self._io.write_error_line(
-                    f"Dependencies are not sorted in {'.'.join(path)}."
-                )
-                self._success = False
-        else:
-            dependency_section_sorter.apply()
+            if dependency_section_sorter.is_sorted():
+                return True, 0
+
+            self._io.write_error_line(
+                f"Dependencies are not sorted in {'.'.join(path)}."
+            )
+            self._success = False
+            self._add_locked_array_path(path, dependency_section)
+            # only unsorted sections are sorted to report the moved packages
+            dependency_section_sorter.sort()
+            return False, dependency_section_sorter.count_moved()
+
+        dependency_section_sorter.sort()
+        if not dependency_section_sorter.has_changed():
+            return True, 0
+
+        moved = dependency_section_sorter.count_moved()
+        original_text = dependency_section.as_string()
+        dependency_section_sorter.apply()
+        self._changed_sections.append((original_text, dependency_section.as_string()))
+        self._changed = True
+        self._add_locked_array_path(path, dependency_section)
+        return False, moved
+
+    def _add_locked_array_path(self, path: List[str], dependency_section: Any) -> None:
+        if (
+            self._keep_lock_fresh
+            and not isinstance(dependency_section, Table)
+            and self._locked_array_patterns.matches(tuple(path))
+        ):
+            self._locked_array_paths.append(".".join(path))
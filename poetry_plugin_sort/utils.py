@@ -1,4 +1,13 @@
-from typing import Any, Dict, List
+import os
+import re
+import tempfile
+
+from contextlib import suppress
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from tomlkit import TOMLDocument
+from tomlkit.toml_file import TOMLFile
 
 
 def get_by_path(d: Dict, path: List[str]) -> Any:
@@ -10,3 +19,96 @@ def get_by_path(d: Dict, path: List[str]) -> Any:
         if d is None:
             return None
     return d
+
+
+def convert_line_endings(content: str, linesep: Optional[str]) -> str:
+    """
+    Converts line endings to `linesep` the same way as tomlkit's `TOMLFile.write`.
+    Mixed or unknown line endings are left as is.
+    """
+    if linesep == "\n":
+        return content.replace("\r\n", "\n")
+    if linesep == "\r\n":
+        return re.sub(r"(?<!\r)\n", "\r\n", content)
+    return content
+
+
+def splice(content: str, replacements: List[Tuple[str, str]]) -> Optional[str]:
+    """
+    Replaces each `old` fragment with `new` one in the content.
+
+    Returns None if any `old` fragment doesn't occur in the content exactly once
+    or fragments overlap, since it's ambiguous then what should be replaced.
+    """
+    spans = []
+    for old, new in replacements:
+        start = content.find(old)
+        if start < 0 or content.find(old, start + 1) >= 0:
+            return None
+        spans.append((start, start + len(old), new))
+
+    spans.sort()
+    parts = []
+    position = 0
+    for start, end, new in spans:
+        if start < position:
+            return None
+        parts += [content[position:start], new]
+        position = end
+    parts.append(content[position:])
+    return "".join(parts)
+
+
+def write_file_atomically(path: Path, content: str) -> None:
+    """
+    Writes the content to a temporary file next to `path` and renames it over
+    `path`, so the file is never left truncated if the process gets killed.
+
+    A symlink is followed, so its target is replaced and the link is kept.
+    """
+    path = path.resolve()
+    fd, tmp_path = tempfile.mkstemp(
+        dir=path.parent, prefix=f".{path.name}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+
+        if path.exists():
+            os.chmod(tmp_path, path.stat().st_mode & 0o7777)
+        os.replace(tmp_path, path)
+    except BaseException:
+        with suppress(FileNotFoundError):
+            os.unlink(tmp_path)
+        raise
+
+
+class _TOMLFile(TOMLFile):
+    @property
+    def path(self) -> Path:
+        return Path(self._path)
+
+
+class PyProjectFile:
+    """
+    A lightweight counterpart of Poetry's `PyProjectTOML` that only needs tomlkit.
+    """
+
+    def __init__(self, path: Path):
+        self._file = _TOMLFile(path)
+        self._data: Optional[TOMLDocument] = None
+
+    @property
+    def file(self) -> _TOMLFile:
+        return self._file
+
+    @property
+    def data(self) -> TOMLDocument:
+        if self._data is None:
+            self._data = self._file.read()
+        return self._data
+
+    def reload(self) -> None:
+        self._data = None
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import subprocess
+
+from pathlib import Path
+from typing import List, Set
+
+
+PYPROJECT_PATHSPEC = ":(glob)**/pyproject.toml"
+
+
+class GitError(Exception):
+    pass
+
+
+def _run_git(directory: Path, *args: str) -> str:
+    try:
+        result = subprocess.run(
+            ["git", *args],
+            cwd=directory,
+            capture_output=True,
+            check=True,
+            text=True,
+        )
+    except FileNotFoundError as e:
+        raise GitError("git is not found") from e
+    except subprocess.CalledProcessError as e:
+        raise GitError(e.stderr.strip() or str(e)) from e
+    return result.stdout
+
+
+def _split_paths(output: str) -> List[str]:
+    return [path for path in output.split("\0") if path]
+
+
+def get_changed_pyproject_files(ref: str, directory: Path) -> Set[Path]:
+    """
+    Returns resolved paths of pyproject.toml files in the git repository of
+    the directory which were changed since `ref` forked from HEAD, including
+    uncommitted and untracked files.
+
+    Only the local repository is used, so `ref` must have been fetched.
+    """
+    root = Path(_run_git(directory, "rev-parse", "--show-toplevel").strip())
+    merge_base = _run_git(directory, "merge-base", ref, "HEAD").strip()
+
+    # comparing the merge base with the working tree includes uncommitted changes
+    changed_paths = _split_paths(
+        _run_git(
+            root,
+            "diff",
+            "--name-only",
+            "--no-renames",
+            "--diff-filter=d",
+            "-z",
+            merge_base,
+            "--",
+            PYPROJECT_PATHSPEC,
+        )
+    )
+    changed_paths += _split_paths(
+        _run_git(
+            root,
+            "ls-files",
+            "--others",
+            "--exclude-standard",
+            "-z",
+            "--",
+            PYPROJECT_PATHSPEC,
+        )
+    )
+    return {(root / path).resolve() for path in changed_paths}
@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+
+POLLING_INTERVAL = 0.5
+DEBOUNCE_DELAY = 0.2
+
+# from <sys/inotify.h>
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_NONBLOCK = os.O_NONBLOCK
+_IN_CLOEXEC = 0o2000000
+_INOTIFY_EVENT = struct.Struct("iIII")
+
+FileSignature = Optional[Tuple[int, int, int]]
+
+
+def get_file_signature(path: Path) -> FileSignature:
+    """Returns a tuple which changes when the file is written or replaced"""
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+class Watcher:
+    def __init__(self, paths: Iterable[Path]):
+        self._paths = {path.absolute() for path in paths}
+
+    def wait(self, timeout: Optional[float] = None) -> Set[Path]:
+        """Waits for changes and returns changed files, or an empty set on timeout"""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class PollingWatcher(Watcher):
+    """Detects changes by comparing signatures of the files periodically"""
+
+    def __init__(self, paths: Iterable[Path], interval: float = POLLING_INTERVAL):
+        super().__init__(paths)
+        self._interval = interval
+        self._signatures = {path: get_file_signature(path) for path in self._paths}
+
+    def wait(self, timeout: Optional[float] = None) -> Set[Path]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            changed_paths = set()
+            for path in self._paths:
+                signature = get_file_signature(path)
+                if signature != self._signatures[path]:
+                    self._signatures[path] = signature
+                    changed_paths.add(path)
+
+            if changed_paths:
+                return changed_paths
+            if deadline is not None and time.monotonic() >= deadline:
+                return set()
+
+            delay = self._interval
+            if deadline is not None:
+                delay = min(delay, max(deadline - time.monotonic(), 0))
+            time.sleep(delay)
+
+
+class InotifyWatcher(Watcher):
+    """
+    Detects changes with Linux inotify. It watches parent directories to catch
+    editors which save files by renaming a temporary file over them.
+    """
+
+    def __init__(self, paths: Iterable[Path]):
+        super().__init__(paths)
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        self._directories: Dict[int, Path] = {}
+        try:
+            for directory in {path.parent for path in self._paths}:
+                wd = libc.inotify_add_watch(
+                    self._fd,
+                    os.fsencode(directory),
+                    _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE,
+                )
+                if wd < 0:
+                    raise OSError(ctypes.get_errno(), f"Can't watch {directory}")
+                self._directories[wd] = directory
+        except OSError:
+            self.close()
+            raise
+
+    def wait(self, timeout: Optional[float] = None) -> Set[Path]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = (
+                None if deadline is None else max(deadline - time.monotonic(), 0)
+            )
+            readable, _, _ = select.select([self._fd], [], [], remaining)
+            if not readable:
+                return set()
+
+            changed_paths = self._read_events()
+            if changed_paths:
+                return changed_paths
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def _read_events(self) -> Set[Path]:
+        try:
+            buffer = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+
+        changed_paths = set()
+        offset = 0
+        while offset < len(buffer):
+            wd, _, _, name_length = _INOTIFY_EVENT.unpack_from(buffer, offset)
+            offset += _INOTIFY_EVENT.size
+            name = buffer[offset : offset + name_length].rstrip(b"\0")
+            offset += name_length
+
+            directory = self._directories.get(wd)
+            if directory is not None and name:
+                path = directory / os.fsdecode(name)
+                if path in self._paths:
+                    changed_paths.add(path)
+        return changed_paths
+
+
+def create_watcher(paths: Iterable[Path]) -> Watcher:
+    """Returns an inotify watcher on Linux and falls back to polling elsewhere"""
+    paths = list(paths)
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(paths)
+        except (OSError, AttributeError):  # no inotify in libc
+            pass
+    return PollingWatcher(paths)
+
+
+def watch(
+    watcher: Watcher,
+    on_change: Callable[[List[Path]], None],
+    debounce: float = DEBOUNCE_DELAY,
+    stop_event: Optional[threading.Event] = None,
+) -> None:
+    """
+    Calls `on_change` with files changed since the previous call.
+
+    Changes are collected until no more of them come during `debounce` seconds.
+    Changes made by `on_change` itself don't trigger another call.
+    """
+    signatures: Dict[Path, FileSignature] = {}
+
+    while stop_event is None or not stop_event.is_set():
+        changed_paths = watcher.wait(timeout=None if stop_event is None else debounce)
+        if not changed_paths:
+            continue
+
+        while True:
+            more_changed_paths = watcher.wait(timeout=debounce)
+            if not more_changed_paths:
+                break
+            changed_paths |= more_changed_paths
+
+        # skip files which haven't changed since `on_change` has written them
+        changed_paths = {
+            path
+            for path in changed_paths
+            if path not in signatures or get_file_signature(path) != signatures[path]
+        }
+        if not changed_paths:
+            continue
+
+        on_change(sorted(changed_paths))
+        for path in changed_paths:
+            signatures[path] = get_file_signature(path)
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import os
 import re
+import subprocess
 
 from pathlib import Path
 from typing import Iterator, Optional
@@ -118,3 +119,21 @@ def application_factory():
         return app
 
     return factory
+
+
+@pytest.fixture
+def git(tmp_path):
+    """Runs git commands in a new repository in `tmp_path`"""
+
+    def run(*args: str) -> str:
+        result = subprocess.run(
+            ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+            cwd=tmp_path,
+            capture_output=True,
+            check=True,
+            text=True,
+        )
+        return result.stdout
+
+    run("init", "-q", "-b", "main")
+    return run
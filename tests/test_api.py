@@ -0,0 +1,130 @@
+import subprocess
+import sys
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import tomlkit
+
+from tomlkit.exceptions import TOMLKitError
+
+from poetry_plugin_sort.api import SortResult, check_text, sort_text
+
+
+def test_sort_text(fixture_dir):
+    text = (fixture_dir / "pyproject_multiple_groups.toml").read_text()
+    expected_text = (fixture_dir / "pyproject_multiple_groups__sorted.toml").read_text()
+
+    result = sort_text(text)
+
+    assert result.text == expected_text
+    assert "tool.poetry.dependencies" in result.changed_sections
+    assert "tool.poetry.group.dev.dependencies" in result.changed_sections
+    assert check_text(text) == result.changed_sections
+    assert sort_text(expected_text) == SortResult(expected_text, [])
+    assert check_text(expected_text) == []
+
+
+def test_sort_text_optionals_to_bottom(fixture_dir):
+    text = (fixture_dir / "pyproject_multiple_groups.toml").read_text()
+    expected_text = (
+        fixture_dir / "pyproject_multiple_groups__sorted_optional.toml"
+    ).read_text()
+
+    assert sort_text(text, optionals_to_bottom=True).text == expected_text
+    assert check_text(expected_text, optionals_to_bottom=True) == []
+    assert check_text(expected_text, optionals_to_bottom=False) != []
+
+    configured_text = text + "\n[tool.poetry-sort]\nmove-optionals-to-bottom = true\n"
+    assert sort_text(configured_text).text.startswith(expected_text)
+
+
+def test_sort_text_pep_sections_and_extra_sections():
+    text = """
+[project.optional-dependencies]
+test = ["pytest", "coverage"]
+
+[dependency-groups]
+dev = ["ruff", "mypy", { include-group = "test" }]
+
+[tool.custom]
+requires = ["b", "a"]
+
+[tool.poetry-sort]
+extra-sections = ["tool.custom.requires"]
+"""
+
+    result = sort_text(text)
+
+    assert sorted(result.changed_sections) == [
+        "dependency-groups.dev",
+        "project.optional-dependencies.test",
+        "tool.custom.requires",
+    ]
+    data = tomlkit.parse(result.text)
+    assert data["project"]["optional-dependencies"]["test"] == ["coverage", "pytest"]
+    assert data["dependency-groups"]["dev"] == [
+        "mypy",
+        "ruff",
+        {"include-group": "test"},
+    ]
+    assert data["tool"]["custom"]["requires"] == ["a", "b"]
+    assert check_text(result.text) == []
+
+
+def test_sort_text_keeps_include_groups_in_place():
+    text = """
+[dependency-groups]
+dev = ["b", "a", {include-group = "test"}]
+test = [
+    "z",
+    # docs
+    {include-group = "docs"},
+    "y",
+    "x"
+]
+"""
+
+    result = sort_text(text)
+
+    assert (
+        result.text
+        == """
+[dependency-groups]
+dev = [ "a","b", {include-group = "test"}]
+test = [
+    "z",
+    # docs
+    {include-group = "docs"},
+    "x",
+    "y"
+]
+"""
+    )
+    assert check_text(result.text) == []
+
+
+def test_sort_text_in_threads(fixture_dir):
+    text = (fixture_dir / "pyproject_multiple_groups.toml").read_text()
+    expected_text = (fixture_dir / "pyproject_multiple_groups__sorted.toml").read_text()
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(sort_text, [text] * 20))
+
+    assert all(result.text == expected_text for result in results)
+
+
+def test_sort_text_invalid_toml():
+    with pytest.raises(TOMLKitError):
+        sort_text("[tool.poetry.dependencies\n")
+
+
+def test_api_does_not_import_poetry_and_cleo():
+    code = (
+        "import sys, poetry_plugin_sort.api;"
+        "print(any(m.split('.')[0] in ('poetry', 'cleo') for m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, check=True, text=True
+    )
+    assert result.stdout.strip() == "False"
@@ -0,0 +1,41 @@
+from poetry_plugin_sort.batch import find_pyproject_files, sort_files
+
+
+def test_find_pyproject_files(tmp_path):
+    for directory in ("", "a", "a/b", ".venv/lib", "node_modules/pkg", "c"):
+        (tmp_path / directory).mkdir(parents=True, exist_ok=True)
+        (tmp_path / directory / "pyproject.toml").touch()
+    (tmp_path / "d").mkdir()
+
+    assert find_pyproject_files(tmp_path) == [
+        tmp_path / "pyproject.toml",
+        tmp_path / "a" / "pyproject.toml",
+        tmp_path / "a" / "b" / "pyproject.toml",
+        tmp_path / "c" / "pyproject.toml",
+    ]
+
+
+def test_sort_files_with_fail_fast(fixture_dir):
+    paths = [
+        str(fixture_dir / "pyproject_multiple_groups__sorted.toml"),
+        str(fixture_dir / "pyproject_multiple_groups.toml"),
+        str(fixture_dir / "pyproject_legacy_dev_group.toml"),
+    ]
+
+    results = list(sort_files(paths, check=True, jobs=1, fail_fast=True))
+
+    assert [(result.path, result.success) for result in results] == [
+        (paths[0], True),
+        (paths[1], False),
+    ]
+    assert "Dependencies are not sorted" in results[1].error
+
+
+def test_sort_files_reports_invalid_files(tmp_path):
+    path = tmp_path / "pyproject.toml"
+    path.write_text("[tool.poetry")
+
+    [result] = sort_files([str(path)], check=True)
+
+    assert result.success is False
+    assert result.error
@@ -0,0 +1,48 @@
+import pytest
+import tomlkit
+
+import poetry_plugin_sort.sort
+
+from benchmarks.generate import GeneratorParams, generate_pyproject
+from benchmarks.run import SORTER_STAGES, STAGES, compare_with_baseline, run_benchmark
+from poetry_plugin_sort.sort import SCOPED_PARSING_MIN_SIZE
+
+
+@pytest.mark.parametrize("form", ("table", "array", "both"))
+def test_generate_pyproject(form):
+    params = GeneratorParams(dependencies=50, groups=3, form=form, seed=1)
+
+    content = generate_pyproject(params)
+
+    assert content == generate_pyproject(params)
+    data = tomlkit.parse(content)
+    assert len(data["tool"]["poetry"]["group"]) == 3
+    assert ("dependencies" in data["tool"]["poetry"]) is (form != "array")
+    assert ("project" in data) is (form != "table")
+
+
+def test_run_benchmark_with_scoped_parser(mocker):
+    """Makes sure that large files are sorted by the scoped parser as in real runs"""
+    params = GeneratorParams(dependencies=1000, groups=2)
+    assert len(generate_pyproject(params)) >= SCOPED_PARSING_MIN_SIZE
+    read_spy = mocker.spy(poetry_plugin_sort.sort, "read_scoped_document")
+
+    result = run_benchmark(params, repeat=1)
+
+    assert result["stages"]["parse-scoped"]["time"] > 0
+    assert read_spy.call_count == 4  # check and sort modes of 2 runs
+    assert read_spy.spy_exception is None
+
+
+def test_run_benchmark():
+    result = run_benchmark(GeneratorParams(dependencies=50, groups=2), repeat=1)
+
+    assert set(result["stages"]) == {*STAGES, *SORTER_STAGES}
+    assert result["stages"]["sorter:sections"]["time"] > 0
+
+    results = {"scenarios": {"table": result}}
+    assert compare_with_baseline(results, results, max_slowdown=0) == []
+
+    baseline = {"scenarios": {"table": {"stages": {"sort": {"time": 1e-9}}}}}
+    [regression] = compare_with_baseline(results, baseline, max_slowdown=0.2)
+    assert regression.startswith("table/sort: ")
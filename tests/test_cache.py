@@ -0,0 +1,77 @@
+import os
+import time
+
+from unittest import mock
+
+from poetry_plugin_sort.cache import (
+    CACHE_MAX_AGE,
+    DeferredSortMarkers,
+    SortedFilesCache,
+)
+
+
+def test_sorted_files_cache(tmp_path):
+    pyproject_path = tmp_path / "pyproject.toml"
+    pyproject_path.write_text('[tool.poetry.dependencies]\npython = "^3.8"\n')
+    cache_path = tmp_path / "cache" / "sorted-files.json"
+
+    cache = SortedFilesCache(cache_path)
+    key = cache.get_key(pyproject_path)
+    assert cache.is_sorted(key) is False
+
+    cache.set_sorted(key)
+    cache.save()
+
+    cache = SortedFilesCache(cache_path)
+    assert cache.is_sorted(key) is True
+
+    with mock.patch.dict(os.environ, {"POETRY_SORT_MOVE_OPTIONALS_TO_BOTTOM": "1"}):
+        assert cache.get_key(pyproject_path) != key
+
+    with mock.patch(
+        "poetry_plugin_sort.cache.get_plugin_version", return_value="99.0.0"
+    ):
+        assert cache.get_key(pyproject_path) != key
+
+    pyproject_path.write_text('[tool.poetry.dependencies]\npython = "^3.9"\n')
+    assert cache.get_key(pyproject_path) != key
+
+    cache.clear()
+    assert not cache_path.exists()
+    assert SortedFilesCache(cache_path).is_sorted(key) is False
+
+
+def test_sorted_files_cache_evicts_old_entries(tmp_path):
+    cache_path = tmp_path / "sorted-files.json"
+
+    cache = SortedFilesCache(cache_path)
+    cache.set_sorted("old")
+    with mock.patch("time.time", return_value=time.time() - CACHE_MAX_AGE - 1):
+        cache.set_sorted("old")
+    cache.set_sorted("new")
+    cache.save()
+
+    cache = SortedFilesCache(cache_path)
+    assert cache.is_sorted("old") is False
+    assert cache.is_sorted("new") is True
+
+
+def test_sorted_files_cache_ignores_broken_file(tmp_path):
+    cache_path = tmp_path / "sorted-files.json"
+    cache_path.write_text("{")
+
+    assert SortedFilesCache(cache_path).is_sorted("key") is False
+
+
+def test_deferred_sort_markers(tmp_path):
+    pyproject_path = tmp_path / "project" / "pyproject.toml"
+    markers = DeferredSortMarkers(tmp_path / "cache" / "deferred")
+    assert markers.is_marked(pyproject_path) is False
+
+    markers.mark(pyproject_path)
+    assert markers.is_marked(pyproject_path) is True
+    assert markers.is_marked(tmp_path / "pyproject.toml") is False
+
+    markers.unmark(pyproject_path)
+    markers.unmark(pyproject_path)
+    assert markers.is_marked(pyproject_path) is False
@@ -0,0 +1,84 @@
+import subprocess
+import sys
+
+import pytest
+import tomlkit
+
+from poetry_plugin_sort.cli import main
+
+
+@pytest.mark.parametrize(
+    ("source_pyproject_filename", "expected_pyproject_filename", "expected_rc"),
+    [
+        ("pyproject_multiple_groups.toml", "pyproject_multiple_groups__sorted.toml", 1),
+        (
+            "pyproject_multiple_groups__sorted.toml",
+            "pyproject_multiple_groups__sorted.toml",
+            0,
+        ),
+    ],
+)
+def test_main(
+    fixture_dir,
+    tmp_path,
+    source_pyproject_filename,
+    expected_pyproject_filename,
+    expected_rc,
+):
+    pyproject_path = tmp_path / "pyproject.toml"
+    pyproject_path.write_text((fixture_dir / source_pyproject_filename).read_text())
+
+    assert main([str(pyproject_path)]) == expected_rc
+
+    expected_pyproject_content = (fixture_dir / expected_pyproject_filename).read_text()
+    assert pyproject_path.read_text() == expected_pyproject_content
+
+
+def test_main_with_check_flag(fixture_dir, capsys):
+    paths = [
+        str(fixture_dir / "pyproject_multiple_groups__sorted.toml"),
+        str(fixture_dir / "pyproject_legacy_dev_group.toml"),
+    ]
+
+    assert main(["--check", *paths]) == 1
+
+    errors = capsys.readouterr().err
+    assert errors == (
+        f"{paths[1]}: Dependencies are not sorted in tool.poetry.dev-dependencies.\n"
+    )
+
+
+def test_main_with_missing_file(tmp_path, capsys):
+    assert main(["--check", str(tmp_path / "pyproject.toml")]) == 1
+    assert "No such file or directory" in capsys.readouterr().err
+
+
+@pytest.fixture()
+def locked_pyproject_path(tmp_path):
+    """A project with an unsorted array hashed by Poetry and a lock file"""
+    pyproject_path = tmp_path / "pyproject.toml"
+    pyproject_path.write_text(
+        '[project]\nname = "test"\ndependencies = ["requests", "click"]\n'
+    )
+    (tmp_path / "poetry.lock").write_text(
+        'package = []\n\n[metadata]\ncontent-hash = "0123456789abcdef"\n'
+    )
+    return pyproject_path
+
+
+def test_main_does_not_import_poetry(fixture_dir, locked_pyproject_path):
+    """Makes sure that the standalone command doesn't load Poetry"""
+    lock_content = (locked_pyproject_path.parent / "poetry.lock").read_text()
+    code = (
+        "import sys\n"
+        "from poetry_plugin_sort.cli import main\n"
+        f"main(['--check', {str(fixture_dir / 'pyproject_legacy_dev_group.toml')!r}])\n"
+        f"main(['--check', {str(locked_pyproject_path)!r}])\n"
+        f"main([{str(locked_pyproject_path)!r}])\n"
+        "assert not any(name.split('.')[0] == 'poetry' for name in sys.modules)\n"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+    pyproject = tomlkit.parse(locked_pyproject_path.read_text())
+    assert pyproject["project"]["dependencies"] == ["click", "requests"]
+    assert (locked_pyproject_path.parent / "poetry.lock").read_text() == lock_content
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import io
+import json
 import os
 
 from unittest import mock
@@ -7,6 +9,22 @@ from unittest import mock
 import pytest
 
 from cleo.io.inputs.argv_input import ArgvInput
+from cleo.io.outputs.buffered_output import BufferedOutput
+from poetry.config import config as poetry_config
+from poetry.console.commands.add import AddCommand
+from poetry.factory import Factory
+from poetry.packages.locker import Locker
+
+import poetry_plugin_sort.batch
+
+from poetry_plugin_sort.cache import DeferredSortMarkers
+from poetry_plugin_sort.plugins import SortDependenciesPlugin
+
+
+# Poetry < 2.0 doesn't keep the document written by `poetry add` in the locker
+requires_pyproject_data = pytest.mark.skipif(
+    not hasattr(Locker, "set_pyproject_data"), reason="requires Poetry >= 2.0"
+)
 
 
 @pytest.mark.parametrize(
@@ -52,15 +70,18 @@ def test_sort_command(
 
 
 @pytest.mark.parametrize(
-    ("argv", "command_path"),
+    ("argv", "command_path", "expected_output"),
     (
         (
             ["", "init"],
             "poetry.console.commands.init.InitCommand",
+            "pyproject_multiple_groups__sorted.toml",
         ),
         (
             ["", "add", "somepckage"],
             "poetry.console.commands.add.AddCommand",
+            # only the main group could be changed
+            "pyproject_multiple_groups__sorted_main.toml",
         ),
     ),
 )
@@ -74,6 +95,7 @@ def test_sort_dependencies_after_calling_another_command(
     mocker,
     argv: list[str],
     command_path: str,
+    expected_output: str,
     poetry_sort_enabled_var,
 ):
     """
@@ -95,9 +117,7 @@ def test_sort_dependencies_after_calling_another_command(
         handle_mock.assert_called_once()
 
         sorted_pyproject_content = poetry.file.path.read_text()
-        expected_pyproject_content = (
-            fixture_dir / "pyproject_multiple_groups__sorted.toml"
-        ).read_text()
+        expected_pyproject_content = (fixture_dir / expected_output).read_text()
         assert sorted_pyproject_content == expected_pyproject_content
 
 
@@ -141,6 +161,155 @@ def test_sort_dependencies_after_calling_another_command_with_disabled_sorting(
         assert pyproject_content_before == pyproject_content_after
 
 
+@pytest.mark.parametrize(
+    ("options", "expected_extra_pattern"),
+    (
+        ({}, "project.optional-dependencies.*"),
+        # Poetry < 2.0 passes a boolean `--optional` flag
+        ({"optional": True}, "project.optional-dependencies.*"),
+        ({"optional": "docs"}, "project.optional-dependencies.docs"),
+    ),
+)
+def test_changed_section_patterns_of_add_command(
+    mocker, options, expected_extra_pattern
+):
+    command = mocker.Mock(spec=AddCommand)
+    command.option.side_effect = lambda name: options.get(name, False)
+
+    patterns = SortDependenciesPlugin()._get_changed_section_patterns(command)
+
+    assert patterns == [
+        "tool.poetry.dependencies",
+        "project.dependencies",
+        expected_extra_pattern,
+    ]
+
+
+def test_defer_sorting_after_calling_another_command(
+    application_factory,
+    fixture_dir,
+    poetry_from_fixture,
+    monkeypatch,
+    mocker,
+    tmp_path,
+):
+    """
+    Makes sure that `POETRY_SORT_DEFER` only marks the project as unsorted
+    and the next `poetry sort` sorts it
+    """
+    monkeypatch.setenv("POETRY_CACHE_DIR", str(tmp_path / "cache"))
+    mocker.patch("poetry.console.commands.add.AddCommand.handle", return_value=0)
+    poetry = poetry_from_fixture("pyproject_multiple_groups.toml")
+    markers = DeferredSortMarkers(tmp_path / "cache" / "poetry-sort" / "deferred")
+    pyproject_content_before = poetry.file.path.read_text()
+
+    with mock.patch.dict(os.environ, {"POETRY_SORT_DEFER": "1"}):
+        app = application_factory(poetry)
+        assert app.run(input=ArgvInput(["", "add", "somepckage"])) == 0
+
+    assert poetry.file.path.read_text() == pyproject_content_before
+    assert markers.is_marked(poetry.file.path) is True
+
+    app = application_factory(poetry)
+    assert app.run(input=ArgvInput(["", "sort"])) == 0
+
+    expected_pyproject_content = (
+        fixture_dir / "pyproject_multiple_groups__sorted.toml"
+    ).read_text()
+    assert poetry.file.path.read_text() == expected_pyproject_content
+    assert markers.is_marked(poetry.file.path) is False
+
+
+def test_sort_command_clears_deferred_sorting_in_project_cache_dir(
+    application_factory,
+    fixture_dir,
+    monkeypatch,
+    mocker,
+    tmp_path,
+):
+    """
+    Makes sure that `poetry sort` looks for the marker of `POETRY_SORT_DEFER`
+    in the cache directory set by poetry.toml of the project
+    """
+    monkeypatch.delenv("POETRY_CACHE_DIR", raising=False)
+    # every run of Poetry starts with a fresh global configuration
+    monkeypatch.setattr(poetry_config, "_default_config", None)
+    mocker.patch("poetry.console.commands.add.AddCommand.handle", return_value=0)
+    project_dir = tmp_path / "project"
+    project_dir.mkdir()
+    (project_dir / "pyproject.toml").write_text(
+        (fixture_dir / "pyproject_multiple_groups.toml").read_text()
+    )
+    (project_dir / "poetry.toml").write_text(
+        f"cache-dir = {str(tmp_path / 'cache')!r}\n"
+    )
+    markers = DeferredSortMarkers(tmp_path / "cache" / "poetry-sort" / "deferred")
+
+    with mock.patch.dict(os.environ, {"POETRY_SORT_DEFER": "1"}):
+        app = application_factory(Factory().create_poetry(project_dir))
+        assert app.run(input=ArgvInput(["", "add", "somepckage"])) == 0
+    assert markers.is_marked(project_dir / "pyproject.toml") is True
+
+    monkeypatch.setattr(poetry_config, "_default_config", None)
+    monkeypatch.chdir(project_dir)
+    app = application_factory()
+    assert app.run(input=ArgvInput(["", "sort"])) == 0
+
+    assert markers.is_marked(project_dir / "pyproject.toml") is False
+
+
+def test_keep_deferred_sorting_after_failed_sorting(
+    application_factory,
+    poetry_from_fixture,
+    monkeypatch,
+    mocker,
+    tmp_path,
+):
+    """Makes sure that the project stays marked as unsorted if sorting fails"""
+    monkeypatch.setenv("POETRY_CACHE_DIR", str(tmp_path / "cache"))
+    mocker.patch("poetry.console.commands.add.AddCommand.handle", return_value=0)
+    mocker.patch("poetry_plugin_sort.sort.Sorter.sort", return_value=False)
+    poetry = poetry_from_fixture("pyproject_multiple_groups.toml")
+    markers = DeferredSortMarkers(tmp_path / "cache" / "poetry-sort" / "deferred")
+    markers.mark(poetry.file.path)
+
+    app = application_factory(poetry)
+    assert app.run(input=ArgvInput(["", "add", "somepckage"])) == 0
+
+    assert markers.is_marked(poetry.file.path) is True
+
+
+def test_sort_all_sections_after_deferred_sorting(
+    application_factory,
+    fixture_dir,
+    poetry_from_fixture,
+    monkeypatch,
+    mocker,
+    tmp_path,
+):
+    """
+    Makes sure that `poetry add` without `POETRY_SORT_DEFER` sorts all sections
+    of the project marked as unsorted, not only the group it changes
+    """
+    monkeypatch.setenv("POETRY_CACHE_DIR", str(tmp_path / "cache"))
+    mocker.patch("poetry.console.commands.add.AddCommand.handle", return_value=0)
+    poetry = poetry_from_fixture("pyproject_multiple_groups.toml")
+    markers = DeferredSortMarkers(tmp_path / "cache" / "poetry-sort" / "deferred")
+
+    with mock.patch.dict(os.environ, {"POETRY_SORT_DEFER": "1"}):
+        app = application_factory(poetry)
+        assert app.run(input=ArgvInput(["", "add", "somepckage"])) == 0
+
+    app = application_factory(poetry)
+    assert app.run(input=ArgvInput(["", "add", "-G", "docs", "somepckage"])) == 0
+
+    expected_pyproject_content = (
+        fixture_dir / "pyproject_multiple_groups__sorted.toml"
+    ).read_text()
+    assert poetry.file.path.read_text() == expected_pyproject_content
+    assert markers.is_marked(poetry.file.path) is False
+
+
 @pytest.mark.parametrize(
     ("argv", "command_path", "exit_code"),
     (
@@ -280,7 +449,394 @@ somepckage = "^1"
 wow = "^123"
 
 [tool.poetry.dev-dependencies]
-flake8 = "^5.0.4"
 flake8-bugbear = "^22.1.11"
+flake8 = "^5.0.4"
     """
     )
+
+
+@pytest.mark.parametrize(
+    ("argv", "expected_output", "expected_rc"),
+    (
+        (["", "sort"], "pyproject_multiple_groups__sorted.toml", 0),
+        (["", "sort", "--check"], "pyproject_multiple_groups.toml", 1),
+    ),
+)
+def test_sort_command_does_not_build_poetry(
+    application_factory,
+    fixture_dir,
+    monkeypatch,
+    mocker,
+    tmp_path,
+    argv: list[str],
+    expected_output: str,
+    expected_rc: int,
+):
+    """
+    Makes sure that `poetry sort` reads pyproject.toml directly without
+    creating the Poetry instance
+    """
+    pyproject_path = tmp_path / "pyproject.toml"
+    pyproject_path.write_text(
+        (fixture_dir / "pyproject_multiple_groups.toml").read_text()
+    )
+    monkeypatch.chdir(tmp_path)
+    create_poetry_mock = mocker.patch("poetry.factory.Factory.create_poetry")
+
+    app = application_factory()
+    assert app.run(input=ArgvInput(argv)) == expected_rc
+
+    create_poetry_mock.assert_not_called()
+    expected_pyproject_content = (fixture_dir / expected_output).read_text()
+    assert pyproject_path.read_text() == expected_pyproject_content
+
+
+@requires_pyproject_data
+def test_add_command_reuses_written_document(
+    application_factory,
+    poetry_factory,
+    mocker,
+):
+    """
+    Makes sure that the plugin doesn't re-read pyproject.toml which
+    `poetry add` has just written
+    """
+    mocker.patch("poetry.installation.installer.Installer.run", return_value=0)
+
+    poetry = poetry_factory(
+        """[tool.poetry]
+name = "test"
+version = "0.1.0"
+description = ""
+authors = ["<author@example.com>"]
+
+[tool.poetry.dependencies]
+python = "^3.7"
+abc = "1"
+wow = "^123"
+"""
+    )
+    app = application_factory(poetry)
+    reload_spy = mocker.spy(poetry.pyproject, "reload")
+
+    assert app.run(input=ArgvInput(["", "add", "somepckage"])) == 0
+
+    reload_spy.assert_not_called()
+    assert poetry.file.path.read_text().endswith(
+        """[tool.poetry.dependencies]
+python = "^3.7"
+abc = "1"
+somepckage = "^1"
+wow = "^123"
+"""
+    )
+
+
+@pytest.mark.parametrize("jobs", ("1", "2"))
+def test_sort_command_with_multiple_files(
+    application_factory,
+    fixture_dir,
+    tmp_path,
+    jobs: str,
+):
+    """Makes sure that `poetry sort` handles files passed as arguments"""
+    sorted_project_path = tmp_path / "sorted"
+    unsorted_project_path = tmp_path / "nested" / "unsorted"
+    for project_path, fixture_name in (
+        (sorted_project_path, "pyproject_multiple_groups__sorted.toml"),
+        (unsorted_project_path, "pyproject_multiple_groups.toml"),
+    ):
+        project_path.mkdir(parents=True)
+        (project_path / "pyproject.toml").write_text(
+            (fixture_dir / fixture_name).read_text()
+        )
+    expected_pyproject_content = (
+        fixture_dir / "pyproject_multiple_groups__sorted.toml"
+    ).read_text()
+
+    app = application_factory()
+    error_output = BufferedOutput()
+    argv = ["", "sort", "--check", "-j", jobs]
+    argv += [str(sorted_project_path), str(unsorted_project_path / "pyproject.toml")]
+    assert app.run(ArgvInput(argv), BufferedOutput(), error_output) == 1
+
+    errors = error_output.fetch()
+    assert f"{unsorted_project_path / 'pyproject.toml'}: Dependencies are not" in errors
+    assert "1 of 2 files failed." in errors
+    assert str(sorted_project_path) not in errors
+
+    argv = ["", "sort", "-j", jobs, "--recursive", str(tmp_path)]
+    assert app.run(input=ArgvInput(argv)) == 0
+
+    for project_path in (sorted_project_path, unsorted_project_path):
+        pyproject_content = (project_path / "pyproject.toml").read_text()
+        assert pyproject_content == expected_pyproject_content
+
+
+def test_sort_command_with_cache(
+    application_factory,
+    fixture_dir,
+    monkeypatch,
+    mocker,
+    tmp_path,
+):
+    """Makes sure that `poetry sort --cache` skips files which are known as sorted"""
+    monkeypatch.setenv("POETRY_CACHE_DIR", str(tmp_path / "cache"))
+    pyproject_path = tmp_path / "pyproject.toml"
+    pyproject_path.write_text(
+        (fixture_dir / "pyproject_multiple_groups.toml").read_text()
+    )
+    argv = ["", "sort", "--check", "--cache", str(tmp_path)]
+    app = application_factory()
+
+    assert app.run(input=ArgvInput(argv)) == 1
+    assert app.run(input=ArgvInput(["", "sort", "--cache", str(tmp_path)])) == 0
+
+    sort_file_spy = mocker.spy(poetry_plugin_sort.batch, "sort_file")
+    assert app.run(input=ArgvInput(argv)) == 0
+    sort_file_spy.assert_not_called()
+
+    assert app.run(input=ArgvInput(["", "sort", "--clear-cache"])) == 0
+    assert app.run(input=ArgvInput(argv)) == 0
+    sort_file_spy.assert_called_once()
+
+
+def test_sort_command_with_changed_since(
+    application_factory,
+    fixture_dir,
+    monkeypatch,
+    tmp_path,
+    git,
+):
+    """
+    Makes sure that `poetry sort --changed-since` checks only files
+    changed in git and it works from a subdirectory
+    """
+    unsorted_content = (fixture_dir / "pyproject_multiple_groups.toml").read_text()
+    for project in ("a", "b"):
+        (tmp_path / "projects" / project).mkdir(parents=True)
+        (tmp_path / "projects" / project / "pyproject.toml").write_text(
+            unsorted_content
+        )
+    git("add", ".")
+    git("commit", "-q", "-m", "initial")
+    (tmp_path / "projects" / "b" / "pyproject.toml").write_text(
+        unsorted_content.replace("[tool.poetry]", "[tool.poetry]  # changed")
+    )
+    monkeypatch.chdir(tmp_path / "projects")
+    app = application_factory()
+    output = BufferedOutput()
+    error_output = BufferedOutput()
+
+    argv = ["", "sort", "--check", "--changed-since", "main"]
+    assert app.run(ArgvInput(argv), output, error_output) == 1
+
+    assert "Skipped 1 of 2 files unchanged since main." in output.fetch()
+    errors = error_output.fetch()
+    assert str(tmp_path / "projects" / "b" / "pyproject.toml") in errors
+    assert str(tmp_path / "projects" / "a" / "pyproject.toml") not in errors
+
+    argv = ["", "sort", "--check", "--changed-since", "unknown"]
+    assert app.run(ArgvInput(argv), output, error_output) == 1
+    assert "Failed to get files changed since unknown" in error_output.fetch()
+
+
+def test_sort_command_with_json_format(
+    application_factory,
+    fixture_dir,
+    tmp_path,
+):
+    """Makes sure that `poetry sort --format json` prints only a JSON report"""
+    sorted_path = tmp_path / "sorted.toml"
+    sorted_path.write_text(
+        (fixture_dir / "pyproject_multiple_groups__sorted.toml").read_text()
+    )
+    unsorted_path = tmp_path / "unsorted.toml"
+    unsorted_path.write_text(
+        (fixture_dir / "pyproject_multiple_groups.toml").read_text()
+    )
+    app = application_factory()
+    output = BufferedOutput()
+    error_output = BufferedOutput()
+
+    argv = ["", "sort", "--check", "--format", "json", "-j", "1"]
+    argv += [str(sorted_path), str(unsorted_path)]
+    assert app.run(ArgvInput(argv), output, error_output) == 1
+
+    report = json.loads(output.fetch())
+    assert error_output.fetch() == ""
+    assert [(file["path"], file["success"]) for file in report["files"]] == [
+        (str(sorted_path), True),
+        (str(unsorted_path), False),
+    ]
+    unsorted_sections = {
+        section["path"]
+        for section in report["files"][1]["sections"]
+        if not section["sorted"]
+    }
+    assert "tool.poetry.dependencies" in unsorted_sections
+    assert report["totals"]["files"] == 2
+    assert report["totals"]["failed"] == 1
+    assert report["totals"]["unsorted_sections"] == len(unsorted_sections)
+
+    argv = ["", "sort", "--format", "json", str(unsorted_path)]
+    assert app.run(ArgvInput(argv), output, error_output) == 0
+
+    report = json.loads(output.fetch())
+    assert report["totals"]["changed"] == 1
+    assert report["totals"]["moved"] > 0
+
+    argv = ["", "sort", "--format", "yaml", str(unsorted_path)]
+    assert app.run(ArgvInput(argv), output, error_output) == 1
+    assert "Invalid format 'yaml'" in error_output.fetch()
+
+
+@pytest.mark.parametrize("check", (True, False))
+def test_sort_command_with_missing_path(application_factory, tmp_path, check):
+    """Makes sure that a missing file fails instead of being sorted as empty"""
+    missing_path = str(tmp_path / "missing" / "pyproject.toml")
+    app = application_factory()
+    output = BufferedOutput()
+    error_output = BufferedOutput()
+
+    argv = ["", "sort", *(["--check"] if check else []), missing_path]
+    assert app.run(ArgvInput(argv), output, error_output) == 1
+    assert output.fetch() == ""
+    assert "No such file or directory" in error_output.fetch()
+
+    argv += ["--format", "json"]
+    assert app.run(ArgvInput(argv), output, error_output) == 1
+
+    [file] = json.loads(output.fetch())["files"]
+    assert file["path"] == missing_path
+    assert file["success"] is False
+    assert "No such file or directory" in file["errors"][0]
+
+
+def test_sort_command_with_missing_recursive_directory(application_factory, tmp_path):
+    app = application_factory()
+    output = BufferedOutput()
+    error_output = BufferedOutput()
+
+    argv = ["", "sort", "--check", "--recursive", str(tmp_path / "missing")]
+    assert app.run(ArgvInput(argv), output, error_output) == 1
+    assert error_output.fetch() == (
+        f"Directory {str(tmp_path / 'missing')!r} doesn't exist.\n"
+    )
+
+
+@pytest.mark.parametrize("jobs", ("x", "0", "-2"))
+def test_sort_command_with_invalid_jobs(application_factory, tmp_path, jobs):
+    app = application_factory()
+    output = BufferedOutput()
+    error_output = BufferedOutput()
+
+    argv = ["", "sort", f"--jobs={jobs}", str(tmp_path)]
+    assert app.run(ArgvInput(argv), output, error_output) == 1
+    assert error_output.fetch() == (
+        f"Invalid number of jobs {jobs!r}, use a positive integer.\n"
+    )
+
+
+def test_sort_command_server(application_factory, fixture_dir):
+    """Makes sure that the server sorts texts the same way as the command"""
+    text = (fixture_dir / "pyproject_multiple_groups.toml").read_text()
+    expected_text = (fixture_dir / "pyproject_multiple_groups__sorted.toml").read_text()
+    requests = [
+        {"jsonrpc": "2.0", "id": 1, "method": "check", "params": {"text": text}},
+        {"jsonrpc": "2.0", "id": 2, "method": "sort", "params": {"text": text}},
+        {"jsonrpc": "2.0", "id": 3, "method": "shutdown"},
+        {"jsonrpc": "2.0", "id": 4, "method": "check", "params": {"text": text}},
+    ]
+    app = application_factory()
+    argv_input = ArgvInput(["", "sort", "--server"])
+    argv_input.set_stream(
+        io.StringIO("".join(json.dumps(request) + "\n" for request in requests))
+    )
+    output = BufferedOutput()
+
+    assert app.run(argv_input, output) == 0
+
+    check_response, sort_response, shutdown_response = map(
+        json.loads, output.fetch().splitlines()
+    )
+    assert check_response["id"] == 1
+    assert "tool.poetry.dependencies" in check_response["result"]["unsortedSections"]
+    assert sort_response["id"] == 2
+    assert sort_response["result"]["text"] == expected_text
+    assert sorted(sort_response["result"]["changedSections"]) == sorted(
+        check_response["result"]["unsortedSections"]
+    )
+    assert shutdown_response == {"jsonrpc": "2.0", "id": 3, "result": None}
+
+
+GROUPS_PYPROJECT = """[tool.poetry]
+name = "test"
+version = "0.1.0"
+description = ""
+authors = ["<author@example.com>"]
+
+[tool.poetry.dependencies]
+python = "^3.8"
+b = "1"
+a = "1"
+
+[tool.poetry.group.dev.dependencies]
+d = "1"
+c = "1"
+
+[tool.poetry.group.docs.dependencies]
+f = "1"
+e = "1"
+"""
+
+
+@pytest.mark.parametrize(
+    ("argv", "sorted_groups"),
+    (
+        (["", "add", "--group", "docs", "somepckage"], ["docs"]),
+        (["", "add", "--dev", "somepckage"], ["dev"]),
+        (["", "add", "somepckage"], ["main"]),
+        (["", "init"], ["main", "dev", "docs"]),
+    ),
+)
+def test_sort_only_changed_group_after_calling_another_command(
+    application_factory,
+    poetry_factory,
+    mocker,
+    argv,
+    sorted_groups,
+):
+    """Makes sure that the hook sorts only the group `poetry add` has changed"""
+    mocker.patch("poetry.console.commands.add.AddCommand.handle", return_value=0)
+    mocker.patch("poetry.console.commands.init.InitCommand.handle", return_value=0)
+    poetry = poetry_factory(GROUPS_PYPROJECT)
+    app = application_factory(poetry)
+
+    assert app.run(input=ArgvInput(argv)) == 0
+
+    content = poetry.file.path.read_text()
+    assert ('a = "1"\nb = "1"' in content) is ("main" in sorted_groups)
+    assert ('c = "1"\nd = "1"' in content) is ("dev" in sorted_groups)
+    assert ('e = "1"\nf = "1"' in content) is ("docs" in sorted_groups)
+
+
+def test_sort_command_with_group(application_factory, monkeypatch, tmp_path):
+    pyproject_path = tmp_path / "pyproject.toml"
+    pyproject_path.write_text(GROUPS_PYPROJECT)
+    monkeypatch.chdir(tmp_path)
+    app = application_factory()
+    output = BufferedOutput()
+
+    argv = ["", "sort", "--check", "--group", "dev", "-G", "docs"]
+    assert app.run(ArgvInput(argv), output, output) == 1
+    assert "tool.poetry.dependencies" not in output.fetch()
+
+    assert app.run(ArgvInput(["", "sort", "-G", "dev", "-G", "docs"])) == 0
+    content = pyproject_path.read_text()
+    assert 'b = "1"\na = "1"' in content
+    assert 'c = "1"\nd = "1"' in content
+    assert 'e = "1"\nf = "1"' in content
+
+    assert app.run(ArgvInput(["", "sort", "--check", "--group", "docs"])) == 0
+    assert app.run(ArgvInput(["", "sort", "--check"])) == 1
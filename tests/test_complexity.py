@@ -0,0 +1,167 @@
+"""
+Makes sure that sorting worst-case sections doesn't grow faster than n log n.
+
+Each case is timed at several sizes and the growth of the best time is
+compared with the growth of `n log n`, so an accidental quadratic pass,
+e.g. over comments attached to packages, fails while noise doesn't.
+"""
+
+import math
+import random
+import time
+
+from typing import Callable, List, NamedTuple
+
+import pytest
+import tomlkit
+
+from poetry_plugin_sort.sort import INCREMENTAL_SORT_MAX_ITEMS, create_section_sorter
+
+
+SIZES = (125, 500, 2000)
+REPEAT = 5
+# how many times the growth may exceed `n log n` due to caches and noise,
+# while quadratic growth exceeds it ~10 times on these sizes
+MAX_GROWTH_RATIO = 3
+
+
+class Case(NamedTuple):
+    generate: Callable[[int], str]
+    path: List[str]
+    sort_optionals_separately: bool = False
+
+
+def _package_names(n: int, seed: int = 0) -> List[str]:
+    names = [f"package-{idx:05d}" for idx in range(n)]
+    random.Random(seed).shuffle(names)
+    return names
+
+
+def comment_runs(n: int) -> str:
+    lines = ["[tool.poetry.dependencies]", 'python = "^3.8"']
+    for name in _package_names(n):
+        lines += ["# a comment", "", "# another comment", f'{name} = "1"']
+    return "\n".join(lines) + "\n"
+
+
+def blank_lines(n: int) -> str:
+    lines = ["[tool.poetry.dependencies]"]
+    for name in sorted(_package_names(n), reverse=True):
+        lines += ["", "", f'{name} = "1"']
+    return "\n".join(lines) + "\n"
+
+
+def trailing_comments(n: int) -> str:
+    lines = ["[tool.poetry.dependencies]"]
+    lines += [f'{name} = "1"' for name in _package_names(n // 2)]
+    lines += ["# a trailing comment"] * (n // 2)
+    return "\n".join(lines) + "\n"
+
+
+def optional_inline_tables(n: int) -> str:
+    lines = ["[tool.poetry.dependencies]"]
+    for idx, name in enumerate(_package_names(n)):
+        optional = "true" if idx % 3 else "false"
+        lines.append(f'{name} = {{ version = "1", optional = {optional} }}')
+    return "\n".join(lines) + "\n"
+
+
+def appended_packages(n: int) -> str:
+    """A sorted section with the most packages which are inserted one by one"""
+    names = sorted(_package_names(n))
+    trailing_names = names[:: n // INCREMENTAL_SORT_MAX_ITEMS][
+        :INCREMENTAL_SORT_MAX_ITEMS
+    ]
+    lines = ["[tool.poetry.dependencies]"]
+    lines += [f'{name} = "1"' for name in names if name not in trailing_names]
+    lines += [f'{name} = "1"' for name in reversed(trailing_names)]
+    return "\n".join(lines) + "\n"
+
+
+def project_dependencies(n: int) -> str:
+    lines = ["[project]", "dependencies = ["]
+    for idx, name in enumerate(_package_names(n)):
+        if idx % 4 == 0:
+            lines.append("    # a comment")
+        lines.append(f'    "{name}>=1",')
+    lines.append("]")
+    return "\n".join(lines) + "\n"
+
+
+CASES = {
+    "comment_runs": Case(comment_runs, ["tool", "poetry", "dependencies"]),
+    "blank_lines": Case(blank_lines, ["tool", "poetry", "dependencies"]),
+    "trailing_comments": Case(trailing_comments, ["tool", "poetry", "dependencies"]),
+    "optional_inline_tables": Case(
+        optional_inline_tables, ["tool", "poetry", "dependencies"], True
+    ),
+    "appended_packages": Case(appended_packages, ["tool", "poetry", "dependencies"]),
+    "project_dependencies": Case(project_dependencies, ["project", "dependencies"]),
+}
+
+
+def _get_section(case: Case, n: int):
+    section = tomlkit.parse(case.generate(n))
+    for key in case.path:
+        section = section[key]
+    return section
+
+
+def _best_time(func: Callable[[], object]) -> float:
+    times = []
+    for _ in range(REPEAT):
+        started_at = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started_at)
+    return min(times)
+
+
+def _measure(case: Case, n: int) -> List[float]:
+    """Returns the best times of checking, sorting and applying the section"""
+    section = _get_section(case, n)
+
+    def check():
+        create_section_sorter(section, case.sort_optionals_separately).is_sorted()
+
+    def sort():
+        create_section_sorter(section, case.sort_optionals_separately).sort()
+
+    sorter = create_section_sorter(section, case.sort_optionals_separately)
+    sorter.sort()
+    # applying the same order again moves the same items, so it can be repeated
+    return [_best_time(check), _best_time(sort), _best_time(sorter.apply)]
+
+
+def _n_log_n(n: int) -> float:
+    return n * math.log(n)
+
+
+@pytest.mark.parametrize("case_name", CASES)
+def test_sorting_scales_as_n_log_n(case_name):
+    case = CASES[case_name]
+    times = {n: _measure(case, n) for n in SIZES}
+
+    smallest = SIZES[0]
+    for n in SIZES[1:]:
+        max_growth = MAX_GROWTH_RATIO * _n_log_n(n) / _n_log_n(smallest)
+        for stage, time_n, time_smallest in zip(
+            ("check", "sort", "apply"), times[n], times[smallest]
+        ):
+            growth = time_n / max(time_smallest, 1e-6)
+            assert growth <= max_growth, (
+                f"{case_name}/{stage}: {smallest} -> {n} items took"
+                f" {growth:.1f} times longer, expected at most {max_growth:.1f}"
+            )
+
+
+@pytest.mark.parametrize("case_name", CASES)
+def test_sorting_worst_cases(case_name):
+    """Makes sure that the generated sections are sorted as expected"""
+    case = CASES[case_name]
+    section = _get_section(case, SIZES[0])
+
+    sorter = create_section_sorter(section, case.sort_optionals_separately)
+    sorter.sort()
+    sorter.apply()
+
+    assert create_section_sorter(section, case.sort_optionals_separately).is_sorted()
@@ -1,8 +1,16 @@
+import dataclasses
 import os
 
 from unittest import mock
 
-from poetry_plugin_sort.config import is_sort_optionals_separately, is_sorting_enabled
+import pytest
+import tomlkit
+
+from poetry_plugin_sort.config import (
+    PluginConfig,
+    is_sort_optionals_separately,
+    is_sorting_enabled,
+)
 
 
 def pyproject_toml_factory(poetry_sort_section):
@@ -79,3 +87,78 @@ def test_is_sort_optionals_separately(poetry_factory):
         config_name="move-optionals-to-bottom",
         default=False,
     )
+
+
+def test_plugin_config_is_frozen():
+    plugin_config = PluginConfig.from_pyproject(
+        tomlkit.parse(pyproject_toml_factory("")), environ={}
+    )
+
+    assert plugin_config == PluginConfig()
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        plugin_config.enabled = False  # type: ignore[misc]
+
+
+def test_plugin_config_reads_environ_once():
+    data = tomlkit.parse(pyproject_toml_factory(""))
+    environ = {"POETRY_SORT_MOVE_OPTIONALS_TO_BOTTOM": "yes"}
+
+    plugin_config = PluginConfig.from_pyproject(data, environ=environ)
+    environ["POETRY_SORT_MOVE_OPTIONALS_TO_BOTTOM"] = "no"
+
+    assert plugin_config.enabled is True
+    assert plugin_config.move_optionals_to_bottom is True
+
+
+def test_plugin_config_invalid_value():
+    data = tomlkit.parse(
+        pyproject_toml_factory(
+            """
+[tool.poetry-sort]
+enabled = "maybe"
+    """
+        )
+    )
+
+    with pytest.raises(ValueError, match="enabled"):
+        PluginConfig.from_pyproject(data, environ={})
+
+
+def test_plugin_config_extra_sections():
+    data = tomlkit.parse(
+        pyproject_toml_factory(
+            """
+[tool.poetry-sort]
+extra-sections = ["tool.custom.dependencies", "tool.plugins.*.requires"]
+    """
+        )
+    )
+    environ = {"POETRY_SORT_EXTRA_SECTIONS": "tool.other"}
+
+    assert PluginConfig.from_pyproject(data, environ=environ).extra_sections == (
+        "tool.custom.dependencies",
+        "tool.plugins.*.requires",
+    )
+
+    data = tomlkit.parse(pyproject_toml_factory(""))
+    environ = {"POETRY_SORT_EXTRA_SECTIONS": "tool.other, tool.'a.b'"}
+
+    assert PluginConfig.from_pyproject(data, environ=environ).extra_sections == (
+        "tool.other",
+        "tool.'a.b'",
+    )
+
+
+@pytest.mark.parametrize("value", ("1", '["tool..other"]', '["tool.a b"]'))
+def test_plugin_config_invalid_extra_sections(value):
+    data = tomlkit.parse(
+        pyproject_toml_factory(
+            f"""
+[tool.poetry-sort]
+extra-sections = {value}
+    """
+        )
+    )
+
+    with pytest.raises(ValueError, match="extra-sections"):
+        PluginConfig.from_pyproject(data, environ={})
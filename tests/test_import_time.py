@@ -0,0 +1,54 @@
+import subprocess
+import sys
+
+from typing import Dict
+
+
+# modules Poetry imports anyway before it loads application plugins
+POETRY_MODULES = (
+    "poetry.console.application",
+    "poetry.console.commands.command",
+    "poetry.plugins.application_plugin",
+)
+PLUGIN_MODULE = "poetry_plugin_sort.plugins"
+# a generous budget to make the test stable on slow CI machines,
+# a local run takes about 1-3 ms
+PLUGIN_IMPORT_TIME_BUDGET_US = 50_000
+
+
+def _get_import_times(code: str) -> Dict[str, int]:
+    """Returns cumulative import times in microseconds by module names"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+
+    import_times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:") :].split("|")
+        import_times[module.strip()] = int(cumulative)
+    return import_times
+
+
+def test_plugin_import_time():
+    """
+    Makes sure that Poetry doesn't import the sorting machinery when it
+    activates the plugin for commands which don't need it, e.g. `poetry run`.
+    """
+    code = "\n".join(f"import {module}" for module in POETRY_MODULES)
+    code += f"\nimport {PLUGIN_MODULE}"
+
+    import_times = _get_import_times(code)
+
+    plugin_modules = {
+        module for module in import_times if module.startswith("poetry_plugin_sort")
+    }
+    assert plugin_modules == {"poetry_plugin_sort", PLUGIN_MODULE}
+    assert "tomlkit" not in import_times
+    assert "poetry.console.commands.add" not in import_times
+    assert "poetry.console.commands.init" not in import_times
+    assert import_times[PLUGIN_MODULE] < PLUGIN_IMPORT_TIME_BUDGET_US
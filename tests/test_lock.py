@@ -0,0 +1,141 @@
+import pytest
+import tomlkit
+
+from cleo.io.buffered_io import BufferedIO
+from poetry.packages.locker import Locker
+
+from poetry_plugin_sort.lock import is_lock_fresh, update_content_hash
+from poetry_plugin_sort.sort import Sorter
+from poetry_plugin_sort.utils import PyProjectFile
+
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(Locker, "set_pyproject_data"),
+    reason="Poetry < 2.0 doesn't hash arrays of pyproject.toml",
+)
+
+
+PYPROJECT = """[project]
+name = "test"
+version = "0.1.0"
+requires-python = ">=3.8"
+dependencies = ["requests", "click"]
+
+[tool.poetry.group.dev.dependencies]
+pytest = "^7"
+mypy = "^1"
+"""
+
+SORTED_TABLE_PYPROJECT = PYPROJECT.replace(
+    '["requests", "click"]', '["click", "requests"]'
+)
+
+LOCK = """# This file is automatically @generated by Poetry 2.1.0.
+package = []
+
+[metadata]
+lock-version = "2.1"
+python-versions = ">=3.8"
+content-hash = "{content_hash}"
+"""
+
+
+def get_content_hash(content):
+    return Locker(None, tomlkit.parse(content))._get_content_hash()
+
+
+@pytest.fixture
+def project(tmp_path):
+    def create_project(content, lock_content=None):
+        path = tmp_path / "pyproject.toml"
+        path.write_text(content)
+        if lock_content is None:
+            lock_content = LOCK.format(content_hash=get_content_hash(content))
+        (tmp_path / "poetry.lock").write_text(lock_content)
+        return path
+
+    return create_project
+
+
+def test_sorting_arrays_updates_fresh_lock(project):
+    path = project(PYPROJECT)
+    io = BufferedIO()
+
+    assert Sorter(None, io, pyproject=PyProjectFile(path)).sort()
+
+    content = path.read_text()
+    assert 'dependencies = [ "click","requests"]' in content
+    assert is_lock_fresh(path.parent / "poetry.lock", content)
+    assert "Updated content-hash of poetry.lock due to reordered" in io.fetch_output()
+
+
+def test_sorting_tables_keeps_lock(project):
+    path = project(SORTED_TABLE_PYPROJECT)
+    lock_content = (path.parent / "poetry.lock").read_text()
+    io = BufferedIO()
+
+    assert Sorter(None, io, pyproject=PyProjectFile(path)).sort()
+
+    assert 'mypy = "^1"\npytest = "^7"' in path.read_text()
+    assert (path.parent / "poetry.lock").read_text() == lock_content
+    assert "poetry.lock" not in io.fetch_output()
+
+
+def test_sorting_keeps_outdated_lock(project):
+    lock_content = LOCK.format(content_hash="0" * 64)
+    path = project(PYPROJECT, lock_content)
+    io = BufferedIO()
+
+    assert Sorter(None, io, pyproject=PyProjectFile(path)).sort()
+
+    assert (path.parent / "poetry.lock").read_text() == lock_content
+    assert "poetry.lock" not in io.fetch_output()
+
+
+def test_check_reports_lock_changes(project):
+    path = project(PYPROJECT)
+    io = BufferedIO()
+
+    assert not Sorter(None, io, check=True, pyproject=PyProjectFile(path)).sort()
+
+    assert (
+        "Sorting project.dependencies will change content-hash of poetry.lock"
+        in io.fetch_error()
+    )
+
+    path = project(SORTED_TABLE_PYPROJECT)
+    assert not Sorter(None, io, check=True, pyproject=PyProjectFile(path)).sort()
+    assert "poetry.lock" not in io.fetch_error()
+
+
+def test_update_content_hash_keeps_line_endings(tmp_path):
+    lock_path = tmp_path / "poetry.lock"
+    lock_path.write_bytes(LOCK.format(content_hash="0" * 64).encode())
+    lock_path.write_bytes(lock_path.read_bytes().replace(b"\n", b"\r\n"))
+
+    assert update_content_hash(lock_path, PYPROJECT)
+    assert not update_content_hash(lock_path, PYPROJECT)
+
+    lock_content = lock_path.read_bytes().decode()
+    assert f'content-hash = "{get_content_hash(PYPROJECT)}"\r\n' in lock_content
+    assert "\n" not in lock_content.replace("\r\n", "")
+
+
+def test_update_content_hash_without_hash(tmp_path):
+    lock_path = tmp_path / "poetry.lock"
+    lock_path.write_text("package = []\n")
+
+    with pytest.raises(ValueError, match="content-hash"):
+        update_content_hash(lock_path, PYPROJECT)
+
+
+def test_sorting_warns_without_content_hash_of_poetry(project, monkeypatch):
+    path = project(PYPROJECT)
+    lock_content = (path.parent / "poetry.lock").read_text()
+    monkeypatch.delattr(Locker, "_get_content_hash")
+    io = BufferedIO()
+
+    assert Sorter(None, io, pyproject=PyProjectFile(path)).sort()
+
+    assert (path.parent / "poetry.lock").read_text() == lock_content
+    assert "Failed to update content-hash of poetry.lock" in io.fetch_error()
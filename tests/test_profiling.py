@@ -0,0 +1,56 @@
+import os
+import pstats
+
+from unittest import mock
+
+from cleo.io.buffered_io import BufferedIO
+
+from poetry_plugin_sort.sort import Sorter
+
+
+def test_sorter_prints_phase_timings(poetry_from_fixture):
+    poetry = poetry_from_fixture("pyproject_multiple_groups.toml")
+    io = BufferedIO()
+
+    with mock.patch.dict(os.environ, {"POETRY_SORT_PROFILE": "1"}):
+        assert Sorter(poetry=poetry, io=io).sort() is True
+
+    phases = [
+        line.split(":")[0]
+        for line in io.fetch_output().splitlines()
+        if line.startswith("[poetry-sort]")
+    ]
+    assert phases[:2] == ["[poetry-sort] load", "[poetry-sort] config"]
+    assert "[poetry-sort] section [tool.poetry.dependencies]" in phases
+    # the fixture reorders `project.dependencies`, which is hashed for the lock
+    assert phases[-3:] == [
+        "[poetry-sort] save",
+        "[poetry-sort] lock",
+        "[poetry-sort] total",
+    ]
+
+
+def test_sorter_does_not_print_phase_timings_by_default(poetry_from_fixture):
+    poetry = poetry_from_fixture("pyproject_multiple_groups.toml")
+    io = BufferedIO()
+
+    assert Sorter(poetry=poetry, io=io).sort() is True
+
+    assert "[poetry-sort]" not in io.fetch_output()
+
+
+def test_sorter_writes_profiles(poetry_from_fixture, tmp_path):
+    poetry = poetry_from_fixture("pyproject_multiple_groups.toml")
+    cprofile_output = tmp_path / "sort.prof"
+    tracemalloc_output = tmp_path / "sort.tracemalloc.txt"
+    environ = {
+        "POETRY_SORT_CPROFILE_OUTPUT": str(cprofile_output),
+        "POETRY_SORT_TRACEMALLOC_OUTPUT": str(tracemalloc_output),
+    }
+
+    with mock.patch.dict(os.environ, environ):
+        assert Sorter(poetry=poetry, io=BufferedIO(), check=True).sort() is False
+
+    stats = pstats.Stats(str(cprofile_output))
+    assert any(function == "sort" for _, _, function in stats.stats)  # type: ignore
+    assert tracemalloc_output.read_text().startswith("Peak memory: ")
@@ -0,0 +1,222 @@
+import pytest
+import tomlkit
+
+from cleo.io.buffered_io import BufferedIO
+
+import poetry_plugin_sort.sort
+
+from benchmarks.generate import GeneratorParams, generate_pyproject
+from poetry_plugin_sort.scan import ScanError, ScopedDocument, read_scoped_document
+from poetry_plugin_sort.sections import SectionPatterns
+from poetry_plugin_sort.sort import Sorter, create_section_sorter
+from poetry_plugin_sort.utils import PyProjectFile
+
+
+EDGE_CASES = (
+    # comments and blank lines around sections and headers
+    """
+# a leading comment
+[tool.poetry.dependencies]  # a header comment
+python = "^3.8"
+# a comment about b
+b = "1"
+
+a = { version = "1", optional = true }  # a trailing comment
+# a comment before the next table
+
+[ tool . poetry . group . "dev.tools" . dependencies ]
+d = "1"
+'c' = "1"
+""",
+    # headers inside multiline strings and arrays of other tables
+    '''
+[tool.other]
+text = """
+[tool.poetry.dependencies]
+z = "1"
+"""
+literal = \'\'\'
+[tool.poetry.dependencies]\'\'\'
+matrix = [
+  [1, 2],  # [not.a.header]
+  ["[x]", "]"],
+]
+
+[tool.poetry.dev-dependencies]
+y = "1"
+x = "1"
+''',
+    # arrays of `project.dependencies`
+    """
+[project]
+name = "test"
+dependencies = ["b", "a"]  # one line
+
+[project.optional-dependencies]
+test = ["d", "c"]
+docs = [
+    "f",
+    "e",
+]
+
+[dependency-groups]
+dev = ["b", { include-group = "test" }, "a"]
+
+[tool.poetry-sort]
+move-optionals-to-bottom = true
+""",
+    """
+[project]
+dependencies = [  # a comment after the bracket
+    # a comment about c
+    "c>=1",
+    "b",
+
+    "a"  # without a trailing comma
+]
+""",
+    # a dependency array defined as a table
+    """
+[project.dependencies]
+b = "1"
+a = "1"
+""",
+    # a multiline value in a dependency table
+    """
+[tool.poetry.dependencies]
+foo = [
+    { version = "<2", python = "<3.8" },
+    { version = ">=2", python = ">=3.8" },
+]
+bar = '''
+'''
+""",
+    # Windows line endings
+    '[tool.poetry.dependencies]\r\nb = "1"\r\n\r\na = "1"\r\n',
+    # no trailing newline
+    '[tool.poetry.dependencies]\nb = "1"\na = "1"',
+)
+
+UNSUPPORTED_CASES = (
+    # dependency sections defined as inline tables or with dotted keys
+    '[tool.poetry]\ndependencies = { b = "1", a = "1" }\n',
+    '[tool.poetry]\ngroup.dev.dependencies.b = "1"\n',
+    "[tool]\npoetry-sort = { enabled = false }\n",
+    'project.dependencies = ["b", "a"]\n',
+    '[project]\noptional-dependencies = { test = ["b", "a"] }\n',
+    # a package specified as a sub-table
+    '[tool.poetry.dependencies]\nb = "1"\n[tool.poetry.dependencies.a]\nversion = 1\n',
+    '[[tool.poetry.group]]\nname = "dev"\n',
+    # a section defined twice
+    '[tool.poetry.dependencies]\nb = "1"\n[tool.poetry.dependencies]\na = "1"\n',
+    # a header inside a multiline string of a dependency section
+    '[tool.poetry.dependencies]\nb = """\n[tool.other]\n"""\na = "1"\n',
+    # not a TOML
+    "[tool.poetry.dependencies\n",
+    'key = "\n',
+    "just text\n",
+)
+
+
+def sort_document(data, sort_optionals_separately: bool = False) -> str:
+    for _, section in SectionPatterns().walk(data):
+        if not section:
+            continue
+
+        sorter = create_section_sorter(section, sort_optionals_separately)
+        sorter.sort()
+        if sorter.has_changed():
+            sorter.apply()
+    return data.as_string()
+
+
+def get_differential_cases(fixture_dir):
+    contents = list(EDGE_CASES)
+    contents += [path.read_text() for path in sorted(fixture_dir.glob("*.toml"))]
+    for seed in range(5):
+        for form in ("table", "array", "both"):
+            params = GeneratorParams(
+                dependencies=60, groups=3, blank_lines=0.2, form=form, seed=seed
+            )
+            contents.append(generate_pyproject(params))
+    return contents
+
+
+@pytest.mark.parametrize("sort_optionals_separately", (False, True))
+def test_scoped_document_sorts_as_tomlkit(fixture_dir, sort_optionals_separately):
+    """Makes sure that both engines produce the same content"""
+    for content in get_differential_cases(fixture_dir):
+        scoped_document = ScopedDocument(content)
+        assert scoped_document.as_string() == content
+
+        expected_content = sort_document(
+            tomlkit.parse(content), sort_optionals_separately
+        )
+        assert sort_document(scoped_document, sort_optionals_separately) == (
+            expected_content
+        )
+
+
+def test_scoped_document_reads_only_sections():
+    scoped_document = ScopedDocument(EDGE_CASES[0] + EDGE_CASES[2])
+
+    assert set(scoped_document) == {"tool", "project", "dependency-groups"}
+    assert set(scoped_document["tool"]) == {"poetry", "poetry-sort"}
+    assert list(scoped_document["tool"]["poetry"]["group"]) == ["dev.tools"]
+    assert set(scoped_document["project"]) == {
+        "dependencies",
+        "optional-dependencies",
+    }
+    assert list(scoped_document["project"]["optional-dependencies"]) == [
+        "test",
+        "docs",
+    ]
+    assert list(scoped_document["dependency-groups"]) == ["dev"]
+    assert scoped_document["tool"]["poetry-sort"] == {"move-optionals-to-bottom": True}
+
+
+@pytest.mark.parametrize("content", UNSUPPORTED_CASES)
+def test_scoped_document_unsupported_content(content):
+    with pytest.raises(ScanError):
+        ScopedDocument(content)
+
+
+def test_scoped_document_reads_extra_sections():
+    content = '[tool.other]\nb = "1"\na = "1"\n\n[tool.poetry.dependencies]\nc = "1"\n'
+
+    scoped_document = ScopedDocument(
+        content, section_patterns=("tool.poetry.dependencies", "tool.other")
+    )
+
+    assert list(scoped_document["tool"]) == ["other", "poetry"]
+    assert scoped_document.as_string() == content
+
+
+def test_read_scoped_document_keeps_line_endings(tmp_path):
+    path = tmp_path / "pyproject.toml"
+    path.write_bytes(EDGE_CASES[-2].encode())
+
+    scoped_document = read_scoped_document(path)
+
+    assert scoped_document.linesep == "\r\n"
+    assert scoped_document.as_string() == EDGE_CASES[-2].replace("\r\n", "\n")
+
+
+@pytest.mark.parametrize("content", (EDGE_CASES[-2], UNSUPPORTED_CASES[5]))
+def test_sorter_with_scoped_document(tmp_path, monkeypatch, mocker, content):
+    """Makes sure that the sorter writes the same content with both engines"""
+    path = tmp_path / "pyproject.toml"
+    path.write_bytes(content.encode())
+    expected_path = tmp_path / "expected.toml"
+    expected_path.write_bytes(content.encode())
+
+    assert Sorter(None, BufferedIO(), pyproject=PyProjectFile(expected_path)).sort()
+
+    monkeypatch.setattr(poetry_plugin_sort.sort, "SCOPED_PARSING_MIN_SIZE", 0)
+    read_spy = mocker.spy(poetry_plugin_sort.sort, "read_scoped_document")
+    assert Sorter(None, BufferedIO(), pyproject=PyProjectFile(path)).sort()
+
+    assert path.read_bytes() == expected_path.read_bytes()
+    read_spy.assert_called_once()
+    assert read_spy.call_args.args[0] == path
+    assert (read_spy.spy_exception is None) is (content == EDGE_CASES[-2])
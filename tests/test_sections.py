@@ -0,0 +1,105 @@
+import pytest
+import tomlkit
+
+from poetry_plugin_sort.sections import (
+    SectionPatterns,
+    get_group_section_patterns,
+    parse_section_pattern,
+    quote_key,
+)
+
+
+@pytest.mark.parametrize(
+    "pattern, expected_path",
+    (
+        ("tool.poetry.dependencies", ("tool", "poetry", "dependencies")),
+        ("tool . poetry-sort", ("tool", "poetry-sort")),
+        ("project.optional-dependencies.*", ("project", "optional-dependencies", "*")),
+        ("tool.\"a.b\".'c d'", ("tool", "a.b", "c d")),
+    ),
+)
+def test_parse_section_pattern(pattern, expected_path):
+    assert parse_section_pattern(pattern) == expected_path
+
+
+@pytest.mark.parametrize("pattern", ("", "tool.", "tool..poetry", "tool.a b", "a.*b"))
+def test_parse_invalid_section_pattern(pattern):
+    with pytest.raises(ValueError):
+        parse_section_pattern(pattern)
+
+
+def test_section_patterns_match_paths():
+    patterns = SectionPatterns()
+
+    assert patterns.matches(("tool", "poetry", "dependencies"))
+    assert patterns.matches(("tool", "poetry", "group", "dev", "dependencies"))
+    assert patterns.matches(("dependency-groups", "test"))
+    assert not patterns.matches(("tool", "poetry", "group", "dev"))
+
+    assert patterns.is_prefix(("tool", "poetry", "group", "dev"))
+    assert patterns.is_prefix(("project",))
+    assert not patterns.is_prefix(("tool", "poetry", "dependencies"))
+
+    assert patterns.is_inside(("tool", "poetry", "dependencies", "a"))
+    assert patterns.is_inside(("project", "optional-dependencies", "test", "a"))
+    assert not patterns.is_inside(("tool", "poetry", "group", "dev"))
+
+
+def test_section_patterns_walk():
+    data = tomlkit.parse(
+        """
+[project]
+dependencies = ["a"]
+optional-dependencies = { test = ["b"], docs = ["c"] }
+
+[tool.poetry.group.dev.dependencies]
+d = "1"
+
+[tool.poetry.dependencies]
+e = "1"
+
+[tool.poetry.group.empty]
+optional = true
+
+[tool.custom]
+requires = ["f"]
+version = "1"
+"""
+    )
+
+    patterns = SectionPatterns(
+        ("tool.*.requires", "tool.poetry.group.*.dependencies", "tool.poetry.version")
+    )
+    assert [path for path, _ in patterns.walk(data)] == [
+        ("tool", "poetry", "group", "dev", "dependencies"),
+        ("tool", "custom", "requires"),
+    ]
+
+    assert [path for path, _ in SectionPatterns().walk(data)] == [
+        ("tool", "poetry", "dependencies"),
+        ("tool", "poetry", "group", "dev", "dependencies"),
+        ("project", "dependencies"),
+        ("project", "optional-dependencies", "test"),
+        ("project", "optional-dependencies", "docs"),
+    ]
+
+
+@pytest.mark.parametrize("key", ("docs", "dev.tools", "it's", 'say "hi"', "a b"))
+def test_quote_key(key):
+    assert parse_section_pattern(f"tool.{quote_key(key)}") == ("tool", key)
+
+
+def test_get_group_section_patterns():
+    assert get_group_section_patterns("main") == [
+        "tool.poetry.dependencies",
+        "project.dependencies",
+        "project.optional-dependencies.*",
+    ]
+    assert get_group_section_patterns("main", "docs")[-1] == (
+        "project.optional-dependencies.docs"
+    )
+    assert get_group_section_patterns("dev.tools") == [
+        'tool.poetry.group."dev.tools".dependencies',
+        'dependency-groups."dev.tools"',
+    ]
+    assert "tool.poetry.dev-dependencies" in get_group_section_patterns("dev")
@@ -0,0 +1,102 @@
+import json
+import pickle
+
+import pytest
+
+from poetry_plugin_sort.server import (
+    INTERNAL_ERROR,
+    INVALID_PARAMS,
+    INVALID_REQUEST,
+    INVALID_TOML,
+    METHOD_NOT_FOUND,
+    PARSE_ERROR,
+    RequestError,
+    SortServer,
+)
+
+
+TEXT = '[tool.poetry.dependencies]\nb = "1"\na = "1"\n'
+
+
+def request(method, params=None, request_id=1):
+    message = {"jsonrpc": "2.0", "id": request_id, "method": method}
+    if params is not None:
+        message["params"] = params
+    return json.dumps(message)
+
+
+def test_sort_and_check():
+    server = SortServer()
+
+    assert server.handle_message(request("check", {"text": TEXT})) == {
+        "jsonrpc": "2.0",
+        "id": 1,
+        "result": {"unsortedSections": ["tool.poetry.dependencies"]},
+    }
+    assert server.handle_message(request("sort", {"text": TEXT}, "a")) == {
+        "jsonrpc": "2.0",
+        "id": "a",
+        "result": {
+            "text": '[tool.poetry.dependencies]\na = "1"\nb = "1"\n',
+            "changedSections": ["tool.poetry.dependencies"],
+        },
+    }
+
+
+@pytest.mark.parametrize(
+    "message, code",
+    (
+        ("{", PARSE_ERROR),
+        ("[]", INVALID_REQUEST),
+        ('{"id": 1, "method": "sort"}', INVALID_REQUEST),
+        (request("format", {"text": TEXT}), METHOD_NOT_FOUND),
+        (request("sort"), INVALID_PARAMS),
+        (request("sort", {"text": TEXT, "optionalsToBottom": "yes"}), INVALID_PARAMS),
+        (request("check", {"text": "[tool.poetry.dependencies\n"}), INVALID_TOML),
+        (
+            request("check", {"text": '[tool.poetry-sort]\nenabled = "maybe"\n'}),
+            INVALID_PARAMS,
+        ),
+    ),
+)
+def test_invalid_request(message, code):
+    response = SortServer().handle_message(message)
+
+    assert response["error"]["code"] == code
+
+
+def test_unexpected_error_keeps_server_running(mocker):
+    mocker.patch("poetry_plugin_sort.server.sort_text", side_effect=RuntimeError)
+    server = SortServer()
+    lines = [request("sort", {"text": TEXT}), request("check", {"text": TEXT}, 2)]
+    responses = []
+
+    server.serve(lines, responses.append)
+
+    assert json.loads(responses[0])["error"]["code"] == INTERNAL_ERROR
+    assert json.loads(responses[1])["id"] == 2
+    assert server.running
+
+
+def test_serve_skips_notifications_and_stops_on_shutdown():
+    lines = [
+        "\n",
+        json.dumps({"jsonrpc": "2.0", "method": "check", "params": {"text": TEXT}}),
+        request("shutdown", request_id=1),
+        request("check", {"text": TEXT}, 2),
+    ]
+    responses = []
+
+    SortServer().serve(lines, responses.append)
+
+    assert responses == ['{"jsonrpc": "2.0", "id": 1, "result": null}']
+
+
+def test_request_error_is_picklable():
+    error = pickle.loads(pickle.dumps(RequestError(INVALID_PARAMS, "Invalid")))
+
+    assert (error.code, error.message, str(error)) == (
+        INVALID_PARAMS,
+        "Invalid",
+        "Invalid",
+    )
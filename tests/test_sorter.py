@@ -3,10 +3,18 @@ import os
 from unittest import mock
 
 import pytest
+import tomlkit
 
+from cleo.io.buffered_io import BufferedIO
 from cleo.io.null_io import NullIO
+from tomlkit import TOMLDocument
 
-from poetry_plugin_sort.sort import Sorter
+from poetry_plugin_sort.sort import (
+    INCREMENTAL_SORT_MAX_ITEMS,
+    SortElement,
+    Sorter,
+    SortTable,
+)
 
 
 @pytest.mark.parametrize(
@@ -79,3 +87,196 @@ def test_sort_with_check_flag(
 
     pyproject_content_after = poetry.file.path.read_text()
     assert pyproject_content_before == pyproject_content_after
+
+
+def test_sort_does_not_rewrite_sorted_file(
+    poetry_from_fixture,
+    mocker,
+):
+    """Makes sure that an already sorted pyproject.toml file won't be written"""
+    poetry = poetry_from_fixture("pyproject_multiple_groups__sorted.toml")
+    write_mock = mocker.patch("poetry_plugin_sort.sort.write_file_atomically")
+
+    sorter = Sorter(poetry=poetry, io=NullIO())
+    assert sorter.sort() is True
+
+    write_mock.assert_not_called()
+
+
+def test_sort_reloads_outdated_document(
+    fixture_dir,
+    poetry_from_fixture,
+):
+    """Makes sure that a passed document is ignored if the file has been changed"""
+    poetry = poetry_from_fixture("pyproject_multiple_groups.toml")
+    outdated_document = tomlkit.parse(
+        (fixture_dir / "pyproject_legacy_dev_group.toml").read_text()
+    )
+
+    sorter = Sorter(poetry=poetry, io=NullIO(), document=outdated_document)
+    assert sorter.sort() is True
+
+    sorted_pyproject_content = poetry.file.path.read_text()
+    expected_pyproject_content = (
+        fixture_dir / "pyproject_multiple_groups__sorted.toml"
+    ).read_text()
+    assert sorted_pyproject_content == expected_pyproject_content
+
+
+@pytest.mark.parametrize("new_items_count", (1, 3, INCREMENTAL_SORT_MAX_ITEMS + 1))
+def test_sort_table_with_appended_items(new_items_count):
+    """
+    Makes sure that items appended to a sorted section are placed the same way
+    as the full sort does
+    """
+    sorted_names = [f"package-{i:03}" for i in range(0, 200, 2)]
+    new_names = [f"package-{i:03}" for i in range(1, 200, 6)][::-1][-new_items_count:]
+    content = "[dependencies]\npython = '^3.8'\n"
+    content += "".join(f"{name} = '1'\n" for name in sorted_names)
+    content += "".join(f"# comment about {name}\n{name} = '1'\n" for name in new_names)
+    content += "\n"
+    table = tomlkit.parse(content)["dependencies"]
+    sorted_prefix = list(table.value.body[: len(sorted_names) + 1])
+
+    sorter = SortTable(table, sort_optionals_separately=False)
+    sorter.sort()
+    assert sorter.has_changed() is True
+    sorter.apply()
+
+    expected_names = ["python", *sorted(sorted_names + new_names)]
+    assert [key.key for key, _ in table.value.body if key] == expected_names
+    for name in new_names:
+        assert f"# comment about {name}\n{name} = '1'\n" in table.as_string()
+    assert [item for item in table.value.body if item in sorted_prefix] == (
+        sorted_prefix
+    )
+
+
+@pytest.mark.parametrize(
+    ("fail_fast", "expected_errors_count"), [(False, 4), (True, 1)]
+)
+def test_sort_with_check_flag_does_not_sort(
+    poetry_from_fixture,
+    mocker,
+    fail_fast,
+    expected_errors_count,
+):
+    """
+    Makes sure that sections are only checked without sorting them and checking
+    stops at the first unsorted section with `fail_fast` flag.
+    Only unsorted sections are sorted to count moved packages, but not changed.
+    """
+    poetry = poetry_from_fixture("pyproject_multiple_groups.toml")
+    sort_spy = mocker.spy(SortElement, "sort")
+    reorder_spy = mocker.spy(SortElement, "_reorder_items")
+    io = BufferedIO()
+
+    sorter = Sorter(poetry=poetry, io=io, check=True, fail_fast=fail_fast)
+    assert sorter.sort() is False
+
+    assert sort_spy.call_count == expected_errors_count
+    reorder_spy.assert_not_called()
+    assert len(io.fetch_error().splitlines()) == expected_errors_count
+
+
+@pytest.mark.parametrize("newline", ("\n", "\r\n"))
+def test_sort_rewrites_only_changed_sections(
+    fixture_dir,
+    poetry_from_fixture,
+    mocker,
+    newline,
+):
+    """
+    Makes sure that only the text of sorted sections is replaced in the file
+    without serializing the whole document
+    """
+    poetry = poetry_from_fixture("pyproject_multiple_groups.toml")
+    content = poetry.file.path.read_text().replace("\n", newline)
+    poetry.file.path.write_bytes(content.encode())
+    as_string_spy = mocker.spy(TOMLDocument, "as_string")
+
+    sorter = Sorter(poetry=poetry, io=NullIO())
+    assert sorter.sort() is True
+
+    as_string_spy.assert_not_called()
+    expected_pyproject_content = (
+        (fixture_dir / "pyproject_multiple_groups__sorted.toml")
+        .read_text()
+        .replace("\n", newline)
+    )
+    assert poetry.file.path.read_bytes() == expected_pyproject_content.encode()
+
+
+def test_sort_rewrites_whole_document_if_section_is_ambiguous(poetry_factory):
+    """
+    Makes sure that the whole document is written if the text of a sorted section
+    can't be found unambiguously in the file
+    """
+    poetry = poetry_factory(
+        """[tool.poetry]
+name = "test"
+version = "0.1.0"
+description = ""
+authors = ["<author@example.com>"]
+
+[tool.poetry.group.a.dependencies]
+b = "1"
+a = "1"
+
+[tool.poetry.group.b.dependencies]
+b = "1"
+a = "1"
+"""
+    )
+
+    sorter = Sorter(poetry=poetry, io=NullIO())
+    assert sorter.sort() is True
+
+    assert poetry.file.path.read_text().endswith(
+        """[tool.poetry.group.a.dependencies]
+a = "1"
+b = "1"
+
+[tool.poetry.group.b.dependencies]
+a = "1"
+b = "1"
+"""
+    )
+
+
+def test_sort_section_results(poetry_factory):
+    poetry = poetry_factory(
+        """[tool.poetry]
+name = "test"
+version = "0.1.0"
+description = ""
+authors = ["<author@example.com>"]
+
+[tool.poetry.dependencies]
+python = "^3.8"
+# a comment about c
+c = "1"
+b = "1"
+a = "1"
+
+[tool.poetry.group.dev.dependencies]
+a = "1"
+b = "1"
+"""
+    )
+
+    sorter = Sorter(poetry=poetry, io=NullIO(), check=True)
+    assert sorter.sort() is False
+    # checking counts the packages which sorting would move
+    assert sorted(result[:3] for result in sorter.section_results) == [
+        ("tool.poetry.dependencies", False, 3),
+        ("tool.poetry.group.dev.dependencies", True, 0),
+    ]
+
+    sorter = Sorter(poetry=poetry, io=NullIO())
+    assert sorter.sort() is True
+    assert sorted(result[:3] for result in sorter.section_results) == [
+        ("tool.poetry.dependencies", False, 3),
+        ("tool.poetry.group.dev.dependencies", True, 0),
+    ]
+    assert all(result.time >= 0 for result in sorter.section_results)
@@ -0,0 +1,58 @@
+import os
+
+import pytest
+
+from poetry_plugin_sort.utils import splice, write_file_atomically
+
+
+def test_write_file_atomically(tmp_path):
+    path = tmp_path / "pyproject.toml"
+    path.write_text("old content")
+    path.chmod(0o640)
+
+    write_file_atomically(path, "new\r\ncontent")
+
+    assert path.read_bytes() == b"new\r\ncontent"
+    assert path.stat().st_mode & 0o777 == 0o640
+    assert os.listdir(tmp_path) == ["pyproject.toml"]
+
+
+def test_write_file_atomically_follows_symlink(tmp_path):
+    target_path = tmp_path / "shared" / "pyproject.toml"
+    target_path.parent.mkdir()
+    target_path.write_text("old content")
+    path = tmp_path / "pyproject.toml"
+    path.symlink_to(target_path)
+
+    write_file_atomically(path, "new content")
+
+    assert path.is_symlink()
+    assert target_path.read_text() == "new content"
+    assert sorted(os.listdir(tmp_path)) == ["pyproject.toml", "shared"]
+    assert os.listdir(target_path.parent) == ["pyproject.toml"]
+
+
+def test_write_file_atomically_keeps_original_file_on_error(tmp_path, mocker):
+    path = tmp_path / "pyproject.toml"
+    path.write_text("old content")
+    mocker.patch("os.replace", side_effect=OSError("disk is full"))
+
+    with pytest.raises(OSError):
+        write_file_atomically(path, "new content")
+
+    assert path.read_text() == "old content"
+    assert os.listdir(tmp_path) == ["pyproject.toml"]
+
+
+@pytest.mark.parametrize(
+    ("replacements", "expected_content"),
+    [
+        ([], "a-b-c"),
+        ([("b", "B"), ("a", "A")], "A-B-c"),
+        ([("-", "+")], None),
+        ([("d", "D")], None),
+        ([("a-b", "A-B"), ("b-c", "B-C")], None),
+    ],
+)
+def test_splice(replacements, expected_content):
+    assert splice("a-b-c", replacements) == expected_content
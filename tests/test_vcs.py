@@ -0,0 +1,35 @@
+import pytest
+
+from poetry_plugin_sort.vcs import GitError, get_changed_pyproject_files
+
+
+def test_get_changed_pyproject_files(tmp_path, git):
+    for directory in ("a", "b", "c", "d"):
+        (tmp_path / directory).mkdir()
+        (tmp_path / directory / "pyproject.toml").write_text("")
+    (tmp_path / "README.md").write_text("")
+    git("add", ".")
+    git("commit", "-q", "-m", "initial")
+    git("checkout", "-q", "-b", "feature")
+
+    (tmp_path / "a" / "pyproject.toml").write_text("[project]\n")
+    git("commit", "-q", "-am", "change a")
+    (tmp_path / "b" / "pyproject.toml").write_text("[project]\n")  # uncommitted
+    (tmp_path / "c" / "pyproject.toml").unlink()
+    (tmp_path / "e").mkdir()
+    (tmp_path / "e" / "pyproject.toml").write_text("")  # untracked
+    (tmp_path / "README.md").write_text("changed")
+
+    changed_files = get_changed_pyproject_files("main", tmp_path / "d")
+
+    assert changed_files == {
+        (tmp_path / directory / "pyproject.toml").resolve()
+        for directory in ("a", "b", "e")
+    }
+
+
+def test_get_changed_pyproject_files_with_unknown_ref(tmp_path, git):
+    git("commit", "-q", "--allow-empty", "-m", "initial")
+
+    with pytest.raises(GitError, match="origin/main"):
+        get_changed_pyproject_files("origin/main", tmp_path)
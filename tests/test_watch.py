@@ -0,0 +1,67 @@
+import sys
+import threading
+
+import pytest
+
+from poetry_plugin_sort.watch import InotifyWatcher, PollingWatcher, watch
+
+
+WATCHERS = [PollingWatcher]
+if sys.platform.startswith("linux"):
+    WATCHERS.append(InotifyWatcher)
+
+
+@pytest.fixture(params=WATCHERS)
+def watcher_class(request):
+    return request.param
+
+
+def test_watcher_detects_changes(watcher_class, tmp_path):
+    path = tmp_path / "pyproject.toml"
+    other_path = tmp_path / "other.toml"
+    path.write_text("a = 1\n")
+    watcher = watcher_class([path])
+    try:
+        assert watcher.wait(timeout=0.1) == set()
+
+        other_path.write_text("a = 2\n")
+        assert watcher.wait(timeout=0.1) == set()
+
+        path.write_text("a = 3\n")
+        assert watcher.wait(timeout=2) == {path}
+
+        # editors often save files by renaming a temporary file
+        other_path.replace(path)
+        assert watcher.wait(timeout=2) == {path}
+    finally:
+        watcher.close()
+
+
+def test_watch_ignores_own_changes(watcher_class, tmp_path):
+    path = tmp_path / "pyproject.toml"
+    path.write_text("b = 1\na = 1\n")
+    watcher = watcher_class([path])
+    stop_event = threading.Event()
+    calls = []
+
+    def on_change(paths):
+        calls.append(paths)
+        path.write_text("".join(sorted(path.read_text().splitlines(True))))
+
+    thread = threading.Thread(
+        target=watch,
+        args=(watcher, on_change),
+        kwargs={"debounce": 0.3, "stop_event": stop_event},
+    )
+    thread.start()
+    try:
+        path.write_text("b = 2\n")
+        path.write_text("b = 2\na = 2\n")
+        thread.join(timeout=2)
+    finally:
+        stop_event.set()
+        thread.join()
+        watcher.close()
+
+    assert calls == [[path]]
+    assert path.read_text() == "a = 2\nb = 2\n"